@@ -0,0 +1,188 @@
+"""
+Performance benchmarks for pyFluidSynth.
+
+Run with ``pytest benchmarks`` (needs ``pip install "pyfluidsynth[benchmark]"``).
+Use ``--benchmark-autosave`` on one release and ``--benchmark-compare`` on the
+next to catch regressions.  Everything renders offline with test/example.sf2.
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+import fluidsynth
+
+ROOT = Path(__file__).resolve().parent.parent
+SF2 = ROOT / "test" / "example.sf2"
+MIDI = ROOT / "test" / "1080-c01.mid"
+
+
+@pytest.fixture
+def synth():
+    synth = fluidsynth.Synth()
+    sfid = synth.sfload(str(SF2))
+    for chan in range(16):
+        synth.program_select(chan, sfid, 0, 0)
+    yield synth
+    synth.delete()
+
+
+def _note_events(count):
+    events = np.zeros(count, dtype=fluidsynth.EVENT_DTYPE)
+    events["type"][0::2] = fluidsynth.NOTE_ON
+    events["type"][1::2] = fluidsynth.NOTE_OFF
+    events["chan"] = np.arange(count) // 2 % 16
+    events["data1"] = 36 + np.arange(count) // 2 % 60
+    events["data2"][0::2] = 100
+    return events
+
+
+@pytest.mark.parametrize("frames", [64, 256, 1024, 4096])
+def test_get_samples(benchmark, synth, frames) -> None:
+    synth.noteon(0, 60, 100)
+    benchmark(synth.get_samples, frames)
+    benchmark.extra_info["frames"] = frames
+
+
+@pytest.mark.parametrize("frames", [64, 256, 1024, 4096])
+def test_get_samples_into(benchmark, synth, frames) -> None:
+    synth.noteon(0, 60, 100)
+    out = np.empty(frames * 2, dtype=np.int16)
+    benchmark(synth.get_samples_into, out)
+    benchmark.extra_info["frames"] = frames
+
+
+def test_noteon_noteoff_rate(benchmark, synth) -> None:
+    def play():
+        for key in range(36, 96):
+            synth.noteon(0, key, 100)
+            synth.noteoff(0, key)
+
+    benchmark(play)
+    benchmark.extra_info["events_per_round"] = 120
+
+
+def test_send_events_rate(benchmark, synth) -> None:
+    events = _note_events(10000)
+    benchmark(synth.send_events, events)
+    benchmark.extra_info["events_per_round"] = len(events)
+
+
+def test_sequencer_note_scheduling(benchmark, synth) -> None:
+    seq = fluidsynth.Sequencer(use_system_timer=False)
+    synth_id = seq.register_fluidsynth(synth)
+
+    def schedule():
+        for i in range(1000):
+            seq.note(i, 0, 60, 100, 10, dest=synth_id)
+
+    benchmark(schedule)
+    benchmark.extra_info["events_per_round"] = 1000
+    seq.delete()
+
+
+def test_sequencer_schedule_many(benchmark, synth) -> None:
+    seq = fluidsynth.Sequencer(use_system_timer=False)
+    synth_id = seq.register_fluidsynth(synth)
+    events = np.zeros(1000, dtype=fluidsynth.SEQUENCER_EVENT_DTYPE)
+    events["time"] = np.arange(1000)
+    events["type"] = fluidsynth.NOTE_ON
+    events["data1"] = 60
+    events["data2"] = 100
+    events["duration"] = 10
+    benchmark(seq.schedule_many, events, dest=synth_id)
+    benchmark.extra_info["events_per_round"] = 1000
+    seq.delete()
+
+
+@pytest.mark.parametrize("mode", ["callback", "queue"])
+def test_sequencer_client_delivery(benchmark, mode) -> None:
+    # Only seq.process() is timed: it runs the client callbacks, in the
+    # sequencer's thread, which is what competes with audio for the GIL.
+    # Both modes hand the same fields (type, dest, data) to the consumer.
+    seq = fluidsynth.Sequencer(use_system_timer=False)
+    if mode == "queue":
+        client = seq.register_queue_client("bench")
+        drain = seq.poll_events
+    else:
+        received = []
+
+        def callback(time, event, seq, data):
+            received.append((time, fluidsynth.fluid_event_get_type(event),
+                             fluidsynth.fluid_event_get_dest(event), fluidsynth.fluid_event_get_data(event)))
+
+        client = seq.register_client("bench", callback)
+        drain = received.clear
+
+    def setup():
+        drain()
+        now = seq.get_tick()
+        for i in range(1000):
+            seq.timer(now + i, data=i, dest=client)
+        return (now + 1000,), {}
+
+    benchmark.pedantic(seq.process, setup=setup, rounds=100)
+    benchmark.extra_info["events_per_round"] = 1000
+    seq.delete()
+
+
+def test_midi2audio_realtime_factor(benchmark, synth, tmp_path) -> None:
+    audiofile = str(tmp_path / "out.wav")
+    frames = benchmark.pedantic(synth.midi2audio, (str(MIDI), audiofile), rounds=3)
+    audio_seconds = frames / synth.get_setting("synth.sample-rate")
+    benchmark.extra_info["audio_seconds"] = audio_seconds
+    benchmark.extra_info["realtime_factor"] = audio_seconds / benchmark.stats.stats.mean
+
+
+@pytest.mark.parametrize("notes", [1, 16, 64, 128])
+def test_polyphony_scaling(benchmark, synth, notes) -> None:
+    for i in range(notes):
+        synth.noteon(i % 16, 36 + i % 60, 100)
+    voices = synth.get_active_voice_count()
+    benchmark(synth.get_samples, 1024)
+    benchmark.extra_info["active_voices"] = voices
+
+
+CORES = sorted({n for n in (1, 2, 4, 8, os.cpu_count() or 1) if n <= (os.cpu_count() or 1)})
+
+
+@pytest.mark.parametrize("cores", CORES)
+def test_cpu_cores_scaling(benchmark, cores) -> None:
+    # a dense score: 192 notes held across all channels, 1 second per round
+    synth = fluidsynth.Synth(cpu_cores=cores, **{"synth.polyphony": 512})
+    sfid = synth.sfload(str(SF2))
+    for chan in range(16):
+        synth.program_select(chan, sfid, 0, 0)
+    for i in range(192):
+        synth.noteon(i % 16, 30 + i % 70, 100)
+    out = np.empty(44100 * 2, dtype=np.float32)
+    benchmark(synth.get_samples_into, out)
+    benchmark.extra_info["cpu_cores"] = synth.get_setting("synth.cpu-cores")
+    benchmark.extra_info["active_voices"] = synth.get_active_voice_count()
+    benchmark.extra_info["realtime_factor"] = 1 / benchmark.stats.stats.mean
+    synth.delete()
+
+
+def _import_fluidsynth(env):
+    subprocess.run([sys.executable, "-c", "import fluidsynth"], env=env, cwd=ROOT, check=True)
+
+
+@pytest.mark.parametrize("pinned", [False, True], ids=["search", "pinned"])
+def test_import_time(benchmark, pinned) -> None:
+    env = dict(os.environ)
+    env.pop(fluidsynth.LIBRARY_ENV, None)
+    if pinned:
+        env[fluidsynth.LIBRARY_ENV] = fluidsynth.lib
+    benchmark.pedantic(_import_fluidsynth, (env,), rounds=5)
+    # includes interpreter startup, compare against the baseline below
+    benchmark.extra_info["pinned_library"] = pinned
+
+
+def test_interpreter_startup_baseline(benchmark) -> None:
+    benchmark.pedantic(subprocess.run, ([sys.executable, "-c", "pass"],), {"check": True}, rounds=5)
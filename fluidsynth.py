@@ -22,24 +22,43 @@
 ================================================================================
 """
 
+import hashlib
+import json
+import math
 import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
 from ctypes import (
     CDLL,
     CFUNCTYPE,
     POINTER,
+    PYFUNCTYPE,
     Structure,
+    addressof,
     byref,
     c_char,
     c_char_p,
     c_double,
     c_float,
     c_int,
+    c_long,
+    c_longlong,
     c_short,
+    c_size_t,
     c_uint,
     c_void_p,
     create_string_buffer,
+    memmove,
 )
 from ctypes.util import find_library
+from itertools import accumulate, count, pairwise
+from struct import calcsize, unpack_from
+from types import MappingProxyType
+from typing import NamedTuple
 
 # DLL search method changed in Python 3.8
 # https://docs.python.org/3/library/os.html#os.add_dll_directory
@@ -50,6 +69,9 @@ if hasattr(os, 'add_dll_directory'):  # Python 3.8+ on Windows only
         # Workaround bug in find_library, it doesn't recognize add_dll_directory
         os.environ['PATH'] += ';C:\\tools\\fluidsynth\\bin'
 
+# Environment variable pinning the FluidSynth library to load
+LIBRARY_ENV = 'PYFLUIDSYNTH_LIBRARY'
+
 # A function to find the FluidSynth library
 # (mostly needed for Windows distributions of libfluidsynth supplied with QSynth)
 def find_libfluidsynth(debug_print: bool = os.getenv("CI")) -> str:
@@ -64,7 +86,15 @@ def find_libfluidsynth(debug_print: bool = os.getenv("CI")) -> str:
     * 'libfluidsynth-3' was found at C:\tools\fluidsynth\bin\libfluidsynth-3.dll. --or--
     * 'fluidsynth-3' was found as C:\tools\fluidsynth\bin\fluidsynth-3.dll. >= v2.4.5
         * https://github.com/FluidSynth/fluidsynth/issues/1543
+
+    Set the PYFLUIDSYNTH_LIBRARY environment variable to the library's
+    file name or path to skip the search, which runs external tools
+    (ldconfig, gcc) on some platforms.  Nothing sets it on import;
+    os.environ[LIBRARY_ENV] = lib lets the worker processes started
+    afterwards reuse the library found.
     """
+    if lib := os.getenv(LIBRARY_ENV):
+        return lib
     libs = "fluidsynth fluidsynth-3 libfluidsynth libfluidsynth-3 libfluidsynth-2 libfluidsynth-1"
     for lib_name in libs.split():
         lib = find_library(lib_name)
@@ -88,19 +118,63 @@ lib = find_libfluidsynth()
 # Architecture (32-/64-bit) must match your Python version
 _fl = CDLL(lib)
 
+class _Binding:
+    """A C function whose ctypes prototype is only built on first use
+
+    Once resolved, a binding replaces itself in the module namespace by
+    the ctypes function, so later calls from this module skip it.
+
+    """
+    __slots__ = ('args', 'func', 'name', 'result')
+
+    def __init__(self, name, result, args):
+        self.name = name
+        self.result = result
+        self.args = args
+        self.func = None
+
+    def resolve(self):
+        """Build the ctypes function complete with parameter flags"""
+        if self.func is None:
+            atypes = []
+            aflags = []
+            for arg in self.args:
+                atypes.append(arg[1])
+                aflags.append((arg[2], arg[0]) + arg[3:])  # noqa: RUF005
+            self.func = CFUNCTYPE(self.result, *atypes)((self.name, _fl), tuple(aflags))
+            if globals().get(self.name) is self:
+                globals()[self.name] = self.func
+        return self.func
+
+    def __call__(self, *args, **kwargs):
+        return self.resolve()(*args, **kwargs)
+
+    @property
+    def _as_parameter_(self):
+        # lets an unresolved binding be passed where ctypes expects the function
+        return self.resolve()
+
+    def __repr__(self):
+        return f'<binding {self.name}>'
+
 # Helper function for declaring function prototypes
 def cfunc(name, result, *args):
-    """Build and apply a ctypes prototype complete with parameter flags"""
+    """Declare a ctypes prototype complete with parameter flags
+
+    The symbol is looked up right away, but the prototype is only
+    built when the function is first called.
+
+    """
     if hasattr(_fl, name):
-        atypes = []
-        aflags = []
-        for arg in args:
-            atypes.append(arg[1])
-            aflags.append((arg[2], arg[0]) + arg[3:])  # noqa: RUF005
-        return CFUNCTYPE(result, *atypes)((name, _fl), tuple(aflags))
+        binding = _Binding(name, result, args)
+        _bindings.append(binding)
+        return binding
     else: # Handle Fluidsynth 1.x, 2.x, etc. API differences
         return None
 
+# every binding declared by cfunc(), for enable_tracing()
+_bindings = []
+
 # Bump this up when changing the interface for users
 api_version = '1.4.0'
 
@@ -115,7 +189,9 @@ fluid_version = cfunc('fluid_version', c_void_p,
                         ('micro', POINTER(c_int), 1))
 
 majver = c_int()
-fluid_version(majver, c_int(), c_int())
+_minver, _micver = c_int(), c_int()
+fluid_version(majver, _minver, _micver)
+_version = (majver.value, _minver.value, _micver.value)
 FLUIDSETTING_EXISTS = FLUID_OK if majver.value > 1 else 1
 
 # fluid settings
@@ -152,9 +228,33 @@ fluid_settings_getint = cfunc('fluid_settings_getint', c_int,
                               ('name', c_char_p, 1),
                               ('val', POINTER(c_int), 1))
 
+fluid_settings_get_type = cfunc('fluid_settings_get_type', c_int,
+                                ('settings', c_void_p, 1),
+                                ('name', c_char_p, 1))
+
+fluid_settings_getint_range = cfunc('fluid_settings_getint_range', c_int,
+                                    ('settings', c_void_p, 1),
+                                    ('name', c_char_p, 1),
+                                    ('min', POINTER(c_int), 1),
+                                    ('max', POINTER(c_int), 1))
+
+fluid_settings_foreach_t = CFUNCTYPE(None, c_void_p, c_char_p, c_int)
+
+fluid_settings_foreach = cfunc('fluid_settings_foreach', None,
+                               ('settings', c_void_p, 1),
+                               ('data', c_void_p, 1),
+                               ('func', fluid_settings_foreach_t, 1))
+
 delete_fluid_settings = cfunc('delete_fluid_settings', None,
                               ('settings', c_void_p, 1))
 
+# fluid_types_enum returned by fluid_settings_get_type()
+FLUID_NO_TYPE = -1
+FLUID_NUM_TYPE = 0
+FLUID_INT_TYPE = 1
+FLUID_STR_TYPE = 2
+FLUID_SET_TYPE = 3
+
 fluid_synth_activate_key_tuning = cfunc('fluid_synth_activate_key_tuning', c_int,
                                         ('synth', c_void_p, 1),
                                         ('bank', c_int, 1),
@@ -229,6 +329,17 @@ fluid_synth_cc = cfunc('fluid_synth_cc', c_int,
                        ('ctrl', c_int, 1),
                        ('val', c_int, 1))
 
+fluid_synth_key_pressure = cfunc('fluid_synth_key_pressure', c_int,
+                                 ('synth', c_void_p, 1),
+                                 ('chan', c_int, 1),
+                                 ('key', c_int, 1),
+                                 ('val', c_int, 1))
+
+fluid_synth_channel_pressure = cfunc('fluid_synth_channel_pressure', c_int,
+                                     ('synth', c_void_p, 1),
+                                     ('chan', c_int, 1),
+                                     ('val', c_int, 1))
+
 fluid_synth_get_cc = cfunc('fluid_synth_get_cc', c_int,
                        ('synth', c_void_p, 1),
                        ('chan', c_int, 1),
@@ -254,6 +365,12 @@ fluid_synth_get_program = cfunc('fluid_synth_get_program', c_int,
 fluid_synth_get_active_voice_count = cfunc('fluid_synth_get_active_voice_count', c_int,
                                            ('synth', c_void_p, 1))
 
+fluid_synth_get_polyphony = cfunc('fluid_synth_get_polyphony', c_int,
+                                  ('synth', c_void_p, 1))
+
+fluid_synth_get_cpu_load = cfunc('fluid_synth_get_cpu_load', c_double,
+                                 ('synth', c_void_p, 1))
+
 fluid_synth_bank_select = cfunc('fluid_synth_bank_select', c_int,
                                 ('synth', c_void_p, 1),
                                 ('chan', c_int, 1),
@@ -280,6 +397,36 @@ fluid_synth_write_s16 = cfunc('fluid_synth_write_s16', c_void_p,
                               ('roff', c_int, 1),
                               ('rincr', c_int, 1))
 
+fluid_synth_write_float = cfunc('fluid_synth_write_float', c_int,
+                                ('synth', c_void_p, 1),
+                                ('len', c_int, 1),
+                                ('lout', c_void_p, 1),
+                                ('loff', c_int, 1),
+                                ('lincr', c_int, 1),
+                                ('rout', c_void_p, 1),
+                                ('roff', c_int, 1),
+                                ('rincr', c_int, 1))
+
+fluid_synth_process = cfunc('fluid_synth_process', c_int,
+                            ('synth', c_void_p, 1),
+                            ('len', c_int, 1),
+                            ('nfx', c_int, 1),
+                            ('fx', POINTER(c_void_p), 1),
+                            ('nout', c_int, 1),
+                            ('out', POINTER(c_void_p), 1))
+
+fluid_synth_count_audio_channels = cfunc('fluid_synth_count_audio_channels', c_int,
+                                         ('synth', c_void_p, 1))
+
+fluid_synth_count_audio_groups = cfunc('fluid_synth_count_audio_groups', c_int,
+                                       ('synth', c_void_p, 1))
+
+fluid_synth_count_effects_channels = cfunc('fluid_synth_count_effects_channels', c_int,
+                                           ('synth', c_void_p, 1))
+
+fluid_synth_count_effects_groups = cfunc('fluid_synth_count_effects_groups', c_int,
+                                         ('synth', c_void_p, 1))
+
 fluid_synth_all_notes_off = cfunc('fluid_synth_all_notes_off', c_int,
                                   ('synth', c_void_p, 1),
                                   ('chan', c_int, 1))
@@ -478,9 +625,81 @@ fluid_event_noteoff = cfunc('fluid_event_noteoff', None,
                          ('channel', c_int, 1),
                          ('key', c_short, 1))
 
+fluid_event_control_change = cfunc('fluid_event_control_change', None,
+                         ('evt', c_void_p, 1),
+                         ('channel', c_int, 1),
+                         ('control', c_short, 1),
+                         ('val', c_int, 1))
+
+fluid_event_program_change = cfunc('fluid_event_program_change', None,
+                         ('evt', c_void_p, 1),
+                         ('channel', c_int, 1),
+                         ('val', c_int, 1))
+
+fluid_event_pitch_bend = cfunc('fluid_event_pitch_bend', None,
+                         ('evt', c_void_p, 1),
+                         ('channel', c_int, 1),
+                         ('val', c_int, 1))
+
+fluid_event_channel_pressure = cfunc('fluid_event_channel_pressure', None,
+                         ('evt', c_void_p, 1),
+                         ('channel', c_int, 1),
+                         ('val', c_int, 1))
+
+fluid_event_key_pressure = cfunc('fluid_event_key_pressure', None,
+                         ('evt', c_void_p, 1),
+                         ('channel', c_int, 1),
+                         ('key', c_short, 1),
+                         ('val', c_int, 1))
+
+fluid_event_get_type = cfunc('fluid_event_get_type', c_int,
+                             ('evt', c_void_p, 1))
+
+fluid_event_get_source = cfunc('fluid_event_get_source', c_short,
+                               ('evt', c_void_p, 1))
+
+fluid_event_get_dest = cfunc('fluid_event_get_dest', c_short,
+                             ('evt', c_void_p, 1))
+
+fluid_event_get_channel = cfunc('fluid_event_get_channel', c_int,
+                                ('evt', c_void_p, 1))
+
+fluid_event_get_key = cfunc('fluid_event_get_key', c_short,
+                            ('evt', c_void_p, 1))
+
+fluid_event_get_velocity = cfunc('fluid_event_get_velocity', c_short,
+                                 ('evt', c_void_p, 1))
+
+fluid_event_get_data = cfunc('fluid_event_get_data', c_void_p,
+                             ('evt', c_void_p, 1))
+
 delete_fluid_event = cfunc('delete_fluid_event', None,
                           ('evt', c_void_p, 1))
 
+# fluid_seq_event_type returned by fluid_event_get_type()
+FLUID_SEQ_NOTE = 0
+FLUID_SEQ_NOTEON = 1
+FLUID_SEQ_NOTEOFF = 2
+FLUID_SEQ_ALLSOUNDSOFF = 3
+FLUID_SEQ_ALLNOTESOFF = 4
+FLUID_SEQ_BANKSELECT = 5
+FLUID_SEQ_PROGRAMCHANGE = 6
+FLUID_SEQ_PROGRAMSELECT = 7
+FLUID_SEQ_PITCHBEND = 8
+FLUID_SEQ_PITCHWHEELSENS = 9
+FLUID_SEQ_MODULATION = 10
+FLUID_SEQ_SUSTAIN = 11
+FLUID_SEQ_CONTROLCHANGE = 12
+FLUID_SEQ_PAN = 13
+FLUID_SEQ_VOLUME = 14
+FLUID_SEQ_REVERBSEND = 15
+FLUID_SEQ_CHORUSSEND = 16
+FLUID_SEQ_TIMER = 17
+FLUID_SEQ_CHANNELPRESSURE = 18
+FLUID_SEQ_KEYPRESSURE = 19
+FLUID_SEQ_SYSTEMRESET = 20
+FLUID_SEQ_UNREGISTERING = 21
+
 fluid_midi_event_get_channel = cfunc('fluid_midi_event_get_channel', c_int,
                                   ('evt', c_void_p, 1))
 
@@ -573,6 +792,27 @@ fluid_mod_test_identity = cfunc(
     "fluid_mod_test_identity", c_void_p, ("mod1", c_void_p, 1), ("mod2", c_void_p, 1),
 )
 
+# MIDI event types (fluid_midi_event_type), used by send_events()
+NOTE_OFF = 0x80
+NOTE_ON = 0x90
+KEY_PRESSURE = 0xA0
+CONTROL_CHANGE = 0xB0
+PROGRAM_CHANGE = 0xC0
+CHANNEL_PRESSURE = 0xD0
+PITCH_BEND = 0xE0
+
+# NumPy structured dtype of the event arrays taken by Synth.send_events()
+EVENT_DTYPE = [('type', 'u1'), ('chan', 'i4'), ('data1', 'i4'), ('data2', 'i4')]
+
+# Events with a frame offset, taken by Synth.render_events()
+TIMED_EVENT_DTYPE = [('frame', 'i8'), *EVENT_DTYPE]
+
+# Events scheduled in bulk by Sequencer.schedule_many(), time in sequencer ticks
+SEQUENCER_EVENT_DTYPE = [('time', 'u4'), *EVENT_DTYPE, ('duration', 'u4')]
+
+# Channel events of a MIDI file as returned by load_midi()
+MIDI_FILE_EVENT_DTYPE = [('tick', 'i8'), ('time_s', 'f8'), *EVENT_DTYPE, ('track', 'u2')]
+
 # fluid_player_status returned by fluid_player_get_status()
 FLUID_PLAYER_READY = 0
 FLUID_PLAYER_PLAYING = 1
@@ -590,10 +830,18 @@ new_fluid_player = cfunc('new_fluid_player', c_void_p,
 delete_fluid_player = cfunc('delete_fluid_player', None,
                              ('player', c_void_p, 1))
 
+fluid_is_midifile = cfunc('fluid_is_midifile', c_int,
+                          ('filename', c_char_p, 1))
+
 fluid_player_add = cfunc('fluid_player_add', c_int,
                          ('player', c_void_p, 1),
                          ('filename', c_char_p, 1))
 
+fluid_player_add_mem = cfunc('fluid_player_add_mem', c_int,
+                             ('player', c_void_p, 1),
+                             ('buffer', c_void_p, 1),
+                             ('len', c_size_t, 1))
+
 
 fluid_player_get_status = cfunc('fluid_player_get_status', c_int,
                                 ('player', c_void_p, 1))
@@ -620,6 +868,20 @@ fluid_player_seek = cfunc('fluid_player_seek', c_int,
 fluid_player_stop = cfunc('fluid_player_stop', c_int,
                           ('player', c_void_p, 1))
 
+fluid_player_get_current_tick = cfunc('fluid_player_get_current_tick', c_int,
+                                      ('player', c_void_p, 1))
+
+fluid_player_get_total_ticks = cfunc('fluid_player_get_total_ticks', c_int,
+                                     ('player', c_void_p, 1))
+
+fluid_player_get_bpm = cfunc('fluid_player_get_bpm', c_int,
+                             ('player', c_void_p, 1))
+
+fluid_player_set_tick_callback = cfunc('fluid_player_set_tick_callback', c_int,
+                                       ('player', c_void_p, 1),
+                                       ('handler', CFUNCTYPE(c_int, c_void_p, c_int), 1),
+                                       ('handler_data', c_void_p, 1))
+
 # fluid audio driver
 new_fluid_audio_driver = cfunc('new_fluid_audio_driver', c_void_p,
                                ('settings', c_void_p, 1),
@@ -725,6 +987,45 @@ fluid_sfont_get_preset = cfunc('fluid_sfont_get_preset', c_void_p,
 fluid_preset_get_name = cfunc('fluid_preset_get_name', c_char_p,
                               ('preset', c_void_p, 1))
 
+fluid_sfont_iteration_start = cfunc('fluid_sfont_iteration_start', None,
+                                    ('sfont', c_void_p, 1))
+
+fluid_sfont_iteration_next = cfunc('fluid_sfont_iteration_next', c_void_p,
+                                   ('sfont', c_void_p, 1))
+
+fluid_preset_get_banknum = cfunc('fluid_preset_get_banknum', c_int,
+                                 ('preset', c_void_p, 1))
+
+fluid_preset_get_num = cfunc('fluid_preset_get_num', c_int,
+                             ('preset', c_void_p, 1))
+
+fluid_synth_sfcount = cfunc('fluid_synth_sfcount', c_int,
+                            ('synth', c_void_p, 1))
+
+# SoundFont loader file callbacks, sizes and offsets are fluid_long_long_t since 2.2
+_sf_size_t = c_longlong if _version >= (2, 2) else c_int
+_sf_offset_t = c_longlong if _version >= (2, 2) else c_long
+fluid_sfloader_callback_open_t = CFUNCTYPE(c_void_p, c_char_p)
+fluid_sfloader_callback_read_t = CFUNCTYPE(c_int, c_void_p, _sf_size_t, c_void_p)
+fluid_sfloader_callback_seek_t = CFUNCTYPE(c_int, c_void_p, _sf_offset_t, c_int)
+fluid_sfloader_callback_tell_t = CFUNCTYPE(_sf_offset_t, c_void_p)
+fluid_sfloader_callback_close_t = CFUNCTYPE(c_int, c_void_p)
+
+new_fluid_defsfloader = cfunc('new_fluid_defsfloader', c_void_p,
+                              ('settings', c_void_p, 1))
+
+fluid_sfloader_set_callbacks = cfunc('fluid_sfloader_set_callbacks', c_int,
+                                     ('loader', c_void_p, 1),
+                                     ('open', fluid_sfloader_callback_open_t, 1),
+                                     ('read', fluid_sfloader_callback_read_t, 1),
+                                     ('seek', fluid_sfloader_callback_seek_t, 1),
+                                     ('tell', fluid_sfloader_callback_tell_t, 1),
+                                     ('close', fluid_sfloader_callback_close_t, 1))
+
+fluid_synth_add_sfloader = cfunc('fluid_synth_add_sfloader', None,
+                                 ('synth', c_void_p, 1),
+                                 ('loader', c_void_p, 1))
+
 fluid_synth_set_reverb = cfunc('fluid_synth_set_reverb', c_int,
                                     ('synth', c_void_p, 1),
                                     ('roomsize', c_double, 1),
@@ -754,35 +1055,438 @@ def fluid_synth_write_s16_stereo(synth, len):
 
     """
     import numpy
-    buf = create_string_buffer(len * 4)
-    fluid_synth_write_s16(synth, len, buf, 0, 2, buf, 1, 2)
-    return numpy.frombuffer(buf[:], dtype=numpy.int16)
+    buf = numpy.empty(len * 2, dtype=numpy.int16)
+    fluid_synth_write_s16(synth, len, buf.ctypes.data, 0, 2, buf.ctypes.data, 1, 2)
+    return buf
+
+
+def _bare_cfunc(name, result, *argtypes, release_gil=True):
+    """Build a ctypes prototype without parameter flags
+
+    These skip the keyword argument handling of cfunc() prototypes
+    and are cheaper to call in tight loops.  With release_gil=False
+    the GIL is kept during the call, which saves handing it over for
+    trivial functions like getters called from callbacks.
+
+    """
+    if hasattr(_fl, name):
+        func = (CFUNCTYPE if release_gil else PYFUNCTYPE)(result, *argtypes)((name, _fl))
+        return _TracedFunction(name, func) if _traced else func
+    return None
+
+
+_event_funcs = None
+
+def _check_events(events, channels):
+    """Validate an event array and return its columns as lists
+
+    events is a structured array with the fields of EVENT_DTYPE, or
+    an integer array with one (type, chan, data1, data2) row per
+    event.  Checks are vectorized; a ValueError names the first bad
+    event.
+
+    """
+    import numpy
+    events = numpy.asarray(events)
+    if events.dtype.names:
+        columns = [events[name] for name in ('type', 'chan', 'data1', 'data2')]
+    elif events.ndim == 2 and events.shape[1] == 4:
+        columns = list(events.T)
+    elif events.size == 0:
+        return [], [], [], []
+    else:
+        raise ValueError("events must be a structured array or have one (type, chan, data1, data2) row per event")
+    type, chan, data1, data2 = (numpy.asarray(c, dtype=numpy.int64).ravel() for c in columns)
+    one_byte_data2 = numpy.isin(type, (NOTE_ON, KEY_PRESSURE, CONTROL_CHANGE))
+    ok = (numpy.isin(type, (NOTE_OFF, NOTE_ON, KEY_PRESSURE, CONTROL_CHANGE,
+                            PROGRAM_CHANGE, CHANNEL_PRESSURE, PITCH_BEND))
+          & (chan >= 0) & (chan < channels)
+          & (data1 >= 0) & (data1 <= numpy.where(type == PITCH_BEND, 16383, 127))
+          & (~one_byte_data2 | ((data2 >= 0) & (data2 <= 127))))
+    if not ok.all():
+        bad = int(numpy.argmin(ok))
+        raise ValueError(f"Invalid event at index {bad}: "
+                         f"type={type[bad]:#x} chan={chan[bad]} data1={data1[bad]} data2={data2[bad]}")
+    return type.tolist(), chan.tolist(), data1.tolist(), data2.tolist()
+
+
+def _send_events(synth, type, chan, data1, data2):
+    """Dispatch already validated event columns to a synth pointer"""
+    global _event_funcs  # noqa: PLW0603
+    if _event_funcs is None:
+        _event_funcs = (
+            _bare_cfunc('fluid_synth_noteon', c_int, c_void_p, c_int, c_int, c_int),
+            _bare_cfunc('fluid_synth_noteoff', c_int, c_void_p, c_int, c_int),
+            _bare_cfunc('fluid_synth_cc', c_int, c_void_p, c_int, c_int, c_int),
+            _bare_cfunc('fluid_synth_program_change', c_int, c_void_p, c_int, c_int),
+            _bare_cfunc('fluid_synth_pitch_bend', c_int, c_void_p, c_int, c_int),
+            _bare_cfunc('fluid_synth_channel_pressure', c_int, c_void_p, c_int, c_int),
+            _bare_cfunc('fluid_synth_key_pressure', c_int, c_void_p, c_int, c_int, c_int),
+        )
+    noteon, noteoff, cc, program_change, pitch_bend, channel_pressure, key_pressure = _event_funcs
+    for t, c, d1, d2 in zip(type, chan, data1, data2, strict=True):
+        if t == NOTE_ON:
+            noteon(synth, c, d1, d2)
+        elif t == NOTE_OFF:
+            noteoff(synth, c, d1)
+        elif t == CONTROL_CHANGE:
+            cc(synth, c, d1, d2)
+        elif t == PROGRAM_CHANGE:
+            program_change(synth, c, d1)
+        elif t == PITCH_BEND:
+            pitch_bend(synth, c, d1)
+        elif t == CHANNEL_PRESSURE:
+            channel_pressure(synth, c, d1)
+        else:
+            key_pressure(synth, c, d1, d2)
+
+
+_seq_event_funcs = None
+
+def _sequencer_event_funcs():
+    """Bare prototypes used by Sequencer.schedule_many()"""
+    global _seq_event_funcs  # noqa: PLW0603
+    if _seq_event_funcs is None:
+        _seq_event_funcs = (
+            _bare_cfunc('fluid_event_note', None, c_void_p, c_int, c_short, c_short, c_uint),
+            _bare_cfunc('fluid_event_noteon', None, c_void_p, c_int, c_short, c_short),
+            _bare_cfunc('fluid_event_noteoff', None, c_void_p, c_int, c_short),
+            _bare_cfunc('fluid_event_control_change', None, c_void_p, c_int, c_short, c_int),
+            _bare_cfunc('fluid_event_program_change', None, c_void_p, c_int, c_int),
+            _bare_cfunc('fluid_event_pitch_bend', None, c_void_p, c_int, c_int),
+            _bare_cfunc('fluid_event_channel_pressure', None, c_void_p, c_int, c_int),
+            _bare_cfunc('fluid_event_key_pressure', None, c_void_p, c_int, c_short, c_int),
+            _bare_cfunc('fluid_sequencer_send_at', c_int, c_void_p, c_void_p, c_uint, c_int),
+        )
+    return _seq_event_funcs
+
+
+def _sample_format(dtype):
+    """Return the NumPy dtype and struct format for an output sample type"""
+    import numpy
+    dtype = numpy.dtype(dtype or numpy.int16)
+    if dtype not in (numpy.int16, numpy.float32):
+        raise TypeError(f"Unsupported sample type {dtype}, use int16 or float32")
+    return dtype, 'h' if dtype == numpy.int16 else 'f'
+
+
+def _buffer_address(buf, format):
+    """Return the address and item count of a writable audio buffer
+
+    buf can be anything supporting the buffer protocol (NumPy array,
+    memoryview, bytearray, mmap...).  It must be C-contiguous and
+    either hold items of the given struct format ('h' for 16-bit,
+    'f' for float) or be a plain byte buffer, which is reinterpreted.
+
+    """
+    view = memoryview(buf)
+    if view.readonly:
+        raise TypeError("Output buffer is read-only")
+    if not view.c_contiguous:
+        raise ValueError("Output buffer must be C-contiguous")
+    itemsize = calcsize(format)
+    if view.format.lstrip('@=') != format and view.format not in ('B', 'b', 'c'):
+        raise TypeError(f"Output buffer has format {view.format!r}, expected {format!r} or bytes")
+    if view.nbytes == 0:
+        raise ValueError("Output buffer is empty")
+    return addressof((c_char * view.nbytes).from_buffer(view)), view.nbytes // itemsize
+
+# SoundFonts given to sfload_bytes()/sfload_fileobj(), name -> byte memoryview or file object
+_memory_soundfonts = {}
+_memory_soundfont_names = count(1)
+# files opened by the SoundFont loader callbacks, handle -> _SoundFontFile
+_sfloader_files = {}
+_sfloader_handles = count(1)
+
+class _SoundFontFile:
+    """A SoundFont file read by libfluidsynth through the loader callbacks
+
+    source is a byte memoryview, read in place, or a binary file
+    object; owned file objects are closed with the handle.
+    """
+    def __init__(self, source, owned=False):
+        import numpy
+        if isinstance(source, memoryview):
+            self.data = numpy.frombuffer(source, numpy.uint8)
+            self.file = None
+        else:
+            self.data = None
+            self.file = source
+        self.owned = owned
+        self.pos = 0
+    def read(self, dest, size):
+        if self.file is None:
+            if self.pos + size > self.data.size:
+                return False
+            memmove(dest, self.data.ctypes.data + self.pos, size)
+            self.pos += size
+            return True
+        view = memoryview((c_char * size).from_address(dest))
+        done = 0
+        while done < size:
+            n = self.file.readinto(view[done:])
+            if not n:
+                return False
+            done += n
+        return True
+    def seek(self, offset, origin):
+        if self.file is not None:
+            self.file.seek(offset, origin)
+            return
+        pos = offset + (0, self.pos, self.data.size)[origin]
+        if not 0 <= pos <= self.data.size:
+            raise ValueError("seek outside of SoundFont data")
+        self.pos = pos
+    def tell(self):
+        return self.pos if self.file is None else self.file.tell()
+    def close(self):
+        if self.owned:
+            self.file.close()
+
+def _sfloader_open(filename):
+    try:
+        name = os.fsdecode(filename)
+        source = _memory_soundfonts.get(name)
+        owned = source is None
+        sffile = _SoundFontFile(open(name, 'rb') if owned else source, owned)  # noqa: SIM115
+    except Exception:  # noqa: BLE001
+        return None
+    handle = next(_sfloader_handles)
+    _sfloader_files[handle] = sffile
+    return handle
+
+def _sfloader_read(dest, size, handle):
+    try:
+        return FLUID_OK if _sfloader_files[handle].read(dest, size) else FLUID_FAILED
+    except Exception:  # noqa: BLE001
+        return FLUID_FAILED
+
+def _sfloader_seek(handle, offset, origin):
+    try:
+        _sfloader_files[handle].seek(offset, origin)
+    except Exception:  # noqa: BLE001
+        return FLUID_FAILED
+    return FLUID_OK
+
+def _sfloader_tell(handle):
+    try:
+        return _sfloader_files[handle].tell()
+    except Exception:  # noqa: BLE001
+        return FLUID_FAILED
+
+def _sfloader_close(handle):
+    try:
+        _sfloader_files.pop(handle).close()
+    except Exception:  # noqa: BLE001
+        return FLUID_FAILED
+    return FLUID_OK
+
+# kept referenced for as long as any synth may call them
+_sfloader_callbacks = (
+    fluid_sfloader_callback_open_t(_sfloader_open),
+    fluid_sfloader_callback_read_t(_sfloader_read),
+    fluid_sfloader_callback_seek_t(_sfloader_seek),
+    fluid_sfloader_callback_tell_t(_sfloader_tell),
+    fluid_sfloader_callback_close_t(_sfloader_close),
+)
+
+def _preset_cache_file(cache_dir, filename):
+    """Return the preset index cache file of a SoundFont file"""
+    st = os.stat(filename)
+    key = f'{filename}\0{st.st_size}\0{st.st_mtime_ns}'.encode()
+    return os.path.join(cache_dir, hashlib.sha256(key).hexdigest() + '.json')
+
+def _read_preset_cache(cache_dir, filename):
+    try:
+        with open(_preset_cache_file(cache_dir, filename)) as f:
+            return {(bank, prog): name for bank, prog, name in json.load(f)}
+    except (OSError, ValueError, TypeError):
+        return None
+
+def _write_preset_cache(cache_dir, filename, presets):
+    try:
+        path = _preset_cache_file(cache_dir, filename)
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump([[bank, prog, name] for (bank, prog), name in presets.items()], f)
+        os.replace(tmp, path)
+    except OSError:
+        pass  # the cache is only an optimization
+
+def _player_add(player, midi):
+    """Queue MIDI on a player, return FLUID_OK or FLUID_FAILED
+
+    midi is a file name, the bytes of a MIDI file (any bytes-like
+    object), a binary file object, or a list or tuple of these, which
+    is queued as a playlist.  In-memory data is copied by
+    libfluidsynth, nothing is written to disk.  Nothing is queued
+    unless every item is a MIDI file (see _is_midi()).
+    """
+    midi = _read_midi(midi)
+    if not _is_midi(midi):
+        return FLUID_FAILED
+    return _player_queue(player, midi)
+
+def _player_queue(player, midi):
+    if isinstance(midi, (list, tuple)):
+        for item in midi:
+            if _player_queue(player, item) == FLUID_FAILED:
+                return FLUID_FAILED
+        return FLUID_OK
+    if isinstance(midi, (str, os.PathLike)):
+        return fluid_player_add(player, os.fsencode(midi))
+    if fluid_player_add_mem is None:
+        return FLUID_FAILED
+    if isinstance(midi, bytes):
+        return fluid_player_add_mem(player, midi, len(midi))
+    import numpy
+    data = numpy.frombuffer(memoryview(midi).cast('B'), numpy.uint8)
+    return fluid_player_add_mem(player, data.ctypes.data, data.size)
+
+def _read_midi(midi):
+    """Return midi given to _player_add() with file objects read into bytes"""
+    if isinstance(midi, (list, tuple)):
+        return [_read_midi(item) for item in midi]
+    if hasattr(midi, 'read'):
+        return midi.read()
+    return midi
+
+def _is_midi(midi):
+    """Tell whether midi read by _read_midi() is MIDI files, like the fluidsynth program does
+
+    fluid_player_add() only queues a file name, a missing or broken
+    file would play as silence.
+    """
+    if isinstance(midi, (list, tuple)):
+        return all(_is_midi(item) for item in midi)
+    if isinstance(midi, (str, os.PathLike)):
+        if fluid_is_midifile is not None:
+            return bool(fluid_is_midifile(os.fsencode(midi)))
+        try:
+            with open(midi, 'rb') as f:
+                return f.read(4).startswith(b'MThd')
+        except OSError:
+            return False
+    return bytes(memoryview(midi).cast('B')[:4]).startswith(b'MThd')
+
+def _midi_name(midi):
+    """Describe MIDI given to _player_add() for error messages"""
+    if isinstance(midi, (str, os.PathLike)):
+        return os.fspath(midi)
+    if isinstance(midi, (list, tuple)):
+        return ', '.join(_midi_name(item) for item in midi)
+    return getattr(midi, 'name', f'<{type(midi).__name__} MIDI data>')
+
+# sha256 of files by (path, size, modification time), see _file_digest()
+_file_digests = {}
+
+def _file_digest(path):
+    """Return the sha256 of a file's contents, hashing each version of it once"""
+    st = os.stat(path)
+    memo = (os.fspath(path), st.st_size, st.st_mtime_ns)
+    digest = _file_digests.get(memo)
+    if digest is None:
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            while chunk := f.read(1 << 20):
+                sha.update(chunk)
+        digest = _file_digests[memo] = sha.hexdigest()
+    return digest
+
+def _midi_digest(midi):
+    """Return midi with file objects read into bytes, and a digest of its contents"""
+    if isinstance(midi, (list, tuple)):
+        items = [_midi_digest(item) for item in midi]
+        return [item for item, _ in items], hashlib.sha256(' '.join(d for _, d in items).encode()).hexdigest()
+    if isinstance(midi, (str, os.PathLike)):
+        return midi, _file_digest(midi)
+    if hasattr(midi, 'read'):
+        midi = midi.read()
+    return midi, hashlib.sha256(memoryview(midi).cast('B')).hexdigest()
 
 
 # Object-oriented interface, simplifies access to functions
 
+# settings pinned by Synth(deterministic=True), those missing from the library are skipped
+DETERMINISTIC_SETTINGS = {
+    'synth.cpu-cores': 1,  # threads mix voices in varying order
+    'synth.parallel-render': 0,
+    'synth.dynamic-sample-loading': 0,
+    'player.timing-source': 'sample',
+    'audio.period-size': 64,
+}
+
 class Synth:
     """Synth represents a FluidSynth synthesizer"""
-    def __init__(self, gain=0.2, samplerate=44100, channels=256, **kwargs):
+    def __init__(self, gain=0.2, samplerate=44100, channels=256, audio_groups=None, cpu_cores=None,
+                 deterministic=False, **kwargs):
         """Create new synthesizer object to control sound generation
 
         Optional keyword arguments:
         gain : scale factor for audio output, default is 0.2
         lower values are quieter, allow more simultaneous notes
         samplerate : output samplerate in Hz, default is 44100 Hz
+        audio_groups : number of separate stereo outputs rendered by
+        get_group_samples(), sets synth.audio-groups and synth.audio-channels
+        cpu_cores : number of threads libfluidsynth renders voices with,
+        or 'auto' for one per CPU available to this process; sets
+        synth.cpu-cores (and synth.parallel-render on libraries that
+        have it), raises ValueError outside the range the library allows;
+        ignored by libraries without synth.cpu-cores
+        deterministic : render bit-identical audio for the same input,
+        however it is split into blocks and in whichever process: pins
+        DETERMINISTIC_SETTINGS over any given here, and renders int16
+        samples as float then rounds them without libfluidsynth's
+        dither.  Files written by midi2audio() are still dithered, use
+        render_midi() with a WavSink for reproducible files
         added capability for passing arbitrary fluid settings using args
         """
+        if deterministic and cpu_cores not in (None, 1):
+            raise ValueError("deterministic renders use a single CPU core")
         self.settings = new_fluid_settings()
         self.setting('synth.gain', gain)
         self.setting('synth.sample-rate', float(samplerate))
         self.setting('synth.midi-channels', channels)
+        if audio_groups is not None:
+            self.setting('synth.audio-groups', audio_groups)
+            self.setting('synth.audio-channels', audio_groups)
+        if cpu_cores is not None:
+            try:
+                self._set_cpu_cores(cpu_cores)
+            except ValueError:
+                delete_fluid_settings(self.settings)
+                raise
         for opt,val in kwargs.items():
             self.setting(opt, val)
+        self.deterministic = deterministic
+        if deterministic:
+            for opt, val in DETERMINISTIC_SETTINGS.items():
+                if (fluid_settings_get_type is None
+                        or fluid_settings_get_type(self.settings, opt.encode()) != FLUID_NO_TYPE):
+                    self.setting(opt, val)
         self.synth = new_fluid_synth(self.settings)
         self.audio_driver = None
         self.midi_driver = None
         self.router = None
         self.custom_router_callback = None
+        self._sfloader = False
+        self._memory_sfonts = {}
+        self._sfont_files = {}
+        self._presets = {}
+        self.render_thread = None
+        self._tick_callback = None
+        self._sfont_digests = {}
+        self._output_setting_names = None
+        self._scratch = threading.local()  # float buffers of _render_undithered()
+        # counters behind stats()
+        self._events = 0
+        self._render_counts = [0] * (len(RENDER_TIME_BUCKETS) + 1)
+        self._render_seconds = 0.0
+        self._render_frames = 0
+        self._stats_last = (time.monotonic(), 0)
+        # the render thread and callers update the counters concurrently
+        self._stats_lock = threading.Lock()
     def setting(self, opt, val):
         """change an arbitrary synth setting, type-smart"""
         if isinstance(val, (str, bytes)):
@@ -791,6 +1495,20 @@ class Synth:
             fluid_settings_setint(self.settings, opt.encode(), val)
         elif isinstance(val, float):
             fluid_settings_setnum(self.settings, opt.encode(), c_double(val))
+    def _set_cpu_cores(self, cpu_cores):
+        name = b'synth.cpu-cores'
+        if fluid_settings_get_type is None or fluid_settings_get_type(self.settings, name) != FLUID_INT_TYPE:
+            return  # such old libraries always render on one thread
+        low, high = c_int(), c_int()
+        fluid_settings_getint_range(self.settings, name, byref(low), byref(high))
+        if cpu_cores == 'auto':
+            available = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+            cpu_cores = max(low.value, min(available or 1, high.value))
+        elif isinstance(cpu_cores, bool) or not isinstance(cpu_cores, int) or not low.value <= cpu_cores <= high.value:
+            raise ValueError(f"cpu_cores must be 'auto' or an integer from {low.value} to {high.value}")
+        self.setting('synth.cpu-cores', cpu_cores)
+        if fluid_settings_get_type(self.settings, b'synth.parallel-render') == FLUID_INT_TYPE:
+            self.setting('synth.parallel-render', int(cpu_cores > 1))
     def get_setting(self, opt):
         """get current value of an arbitrary synth setting"""
         val = c_int()
@@ -839,18 +1557,95 @@ class Synth:
         return FLUID_OK
 
     def delete(self):
+        if self.render_thread is not None:
+            self.render_thread.stop()
         if self.audio_driver:
             delete_fluid_audio_driver(self.audio_driver)
         if self.midi_driver:
             delete_fluid_midi_driver(self.midi_driver)
         delete_fluid_synth(self.synth)
         delete_fluid_settings(self.settings)
+        for name in self._memory_sfonts.values():
+            _memory_soundfonts.pop(name, None)
+        self._memory_sfonts.clear()
+        self._sfont_files.clear()
+        self._sfont_digests.clear()
+        self._presets.clear()
     def sfload(self, filename, update_midi_preset=0):
-        """Load SoundFont and return its ID"""
-        return fluid_synth_sfload(self.synth, filename.encode(), update_midi_preset)
+        """Load SoundFont and return its ID
+
+        libfluidsynth keeps one copy of a SoundFont's sample data per
+        process: synths loading the same file name (with the same
+        modification time) share it, unless synth.dynamic-sample-loading
+        is enabled.  See also preload_soundfont().
+        """
+        sfid = fluid_synth_sfload(self.synth, filename.encode(), update_midi_preset)
+        if sfid != FLUID_FAILED:
+            self._sfont_files[sfid] = os.path.abspath(filename)
+        return sfid
+    def sfload_bytes(self, buffer, update_midi_preset=0, cacheable=False):
+        """Load a SoundFont from memory and return its ID
+
+        buffer is any bytes-like object (bytes, bytearray, mmap, NumPy
+        array...) holding a whole SoundFont file; it is read in place,
+        not copied.  With synth.dynamic-sample-loading enabled the
+        synth keeps a reference to it until the SoundFont is unloaded.
+
+        Renders using the SoundFont bypass RenderCache, which only
+        knows SoundFont files by their contents, unless cacheable is
+        true: the buffer is then hashed once while loading.
+
+        The first call installs a SoundFont loader on the synth that
+        reads all later SoundFonts, files included, through Python.
+        libfluidsynth only accepts it before any SoundFont is loaded,
+        so call this before sfload() on the same synth.  Like sfload(),
+        returns FLUID_FAILED if the SoundFont can't be loaded, which is
+        always the case with libfluidsynth older than 2.0.
+        """
+        source = memoryview(buffer).cast('B')
+        digest = hashlib.sha256(source).hexdigest() if cacheable else None
+        return self._sfload_source(source, update_midi_preset, digest)
+    def sfload_fileobj(self, f, update_midi_preset=0):
+        """Load a SoundFont from a seekable binary file object and return its ID
+
+        f is read with readinto() and is not closed.  See sfload_bytes()
+        for when the synth keeps a reference and when this can be called.
+        """
+        return self._sfload_source(f, update_midi_preset)
+    def _sfload_source(self, source, update_midi_preset, digest=None):
+        if not self._sfloader:
+            if new_fluid_defsfloader is None:
+                return FLUID_FAILED
+            if fluid_synth_sfcount(self.synth) > 0:
+                raise RuntimeError("SoundFonts must be loaded from memory before any is loaded with sfload()")
+            loader = new_fluid_defsfloader(self.settings)
+            if not loader:
+                raise Exception("SoundFont loader creation failed")
+            fluid_sfloader_set_callbacks(loader, *_sfloader_callbacks)
+            fluid_synth_add_sfloader(self.synth, loader)
+            self._sfloader = True
+        name = f'<memory SoundFont {next(_memory_soundfont_names)}>'
+        _memory_soundfonts[name] = source
+        sfid = fluid_synth_sfload(self.synth, name.encode(), update_midi_preset)
+        if sfid != FLUID_FAILED:
+            # None keeps renders out of RenderCache, the contents are unknown
+            self._sfont_digests[sfid] = digest
+        if sfid == FLUID_FAILED or not self.get_setting('synth.dynamic-sample-loading'):
+            # every sample is in memory already, nothing will read the source again
+            del _memory_soundfonts[name]
+        else:
+            self._memory_sfonts[sfid] = name
+        return sfid
     def sfunload(self, sfid, update_midi_preset=0):
         """Unload a SoundFont and free memory it used"""
-        return fluid_synth_sfunload(self.synth, sfid, update_midi_preset)
+        result = fluid_synth_sfunload(self.synth, sfid, update_midi_preset)
+        self._sfont_files.pop(sfid, None)
+        self._sfont_digests.pop(sfid, None)
+        self._presets.pop(sfid, None)
+        name = self._memory_sfonts.pop(sfid, None)
+        if name is not None:
+            _memory_soundfonts.pop(name, None)
+        return result
     def program_select(self, chan, sfid, bank, preset):
         """Select a program"""
         return fluid_synth_program_select(self.synth, chan, sfid, bank, preset)
@@ -878,9 +1673,46 @@ class Synth:
         else:
             (sfontid, banknum, prognum, _presetname) = self.channel_info(chan)
             return (sfontid, banknum, prognum)
+    def sfont_presets(self, sfid, cache_dir=None):
+        """Return the presets of a loaded SoundFont as a {(bank, prog): name} mapping
+
+        The SoundFont is walked once, the index is kept until sfunload().
+        With cache_dir, the index of a SoundFont loaded from a file is
+        also stored there, keyed by the file's path, size and
+        modification time, so later synths and runs read it back
+        instead of walking the SoundFont.
+        """
+        presets = self._presets.get(sfid)
+        if presets is None:
+            filename = self._sfont_files.get(sfid) if cache_dir is not None else None
+            if filename is not None:
+                presets = _read_preset_cache(cache_dir, filename)
+            if presets is None:
+                presets = self._walk_presets(sfid)
+                if filename is not None:
+                    _write_preset_cache(cache_dir, filename, presets)
+            self._presets[sfid] = presets
+        return MappingProxyType(presets)
+    def _walk_presets(self, sfid):
+        sfont = fluid_synth_get_sfont_by_id(self.synth, sfid)
+        if not sfont:
+            raise ValueError(f"No SoundFont with ID {sfid}")
+        presets = {}
+        fluid_sfont_iteration_start(sfont)
+        preset = fluid_sfont_iteration_next(sfont)
+        while preset:
+            key = (fluid_preset_get_banknum(preset), fluid_preset_get_num(preset))
+            presets[key] = fluid_preset_get_name(preset).decode('latin-1')
+            preset = fluid_sfont_iteration_next(sfont)
+        return presets
     def sfpreset_name(self, sfid, bank, prenum):
         """Return name of a soundfont preset"""
-        if fluid_synth_get_sfont_by_id is not None:
+        if fluid_sfont_iteration_start is not None:
+            try:
+                return self.sfont_presets(sfid).get((bank, prenum))
+            except ValueError:
+                return None
+        elif fluid_synth_get_sfont_by_id is not None:
             sfont=fluid_synth_get_sfont_by_id(self.synth, sfid)
             preset=fluid_sfont_get_preset(sfont, bank, prenum)
             if not preset:
@@ -1027,7 +1859,7 @@ class Synth:
     def get_chorus_nr(self):
         return fluid_synth_get_chorus_nr(self.synth)
     def get_chorus_level(self):
-        return fluid_synth_get_reverb_level(self.synth)
+        return fluid_synth_get_chorus_level(self.synth)
     def get_chorus_speed(self):
         if fluid_synth_get_chorus_speed is not None:
             return fluid_synth_get_chorus_speed(self.synth)
@@ -1048,6 +1880,7 @@ class Synth:
             return False
         if vel < 0 or vel > 127:
             return False
+        self._count_events(1)
         return fluid_synth_noteon(self.synth, chan, key, vel)
     def noteoff(self, chan, key):
         """Stop a note"""
@@ -1055,6 +1888,7 @@ class Synth:
             return False
         if chan < 0:
             return False
+        self._count_events(1)
         return fluid_synth_noteoff(self.synth, chan, key)
     def pitch_bend(self, chan, val):
         """Adjust pitch of a playing channel by small amounts
@@ -1065,6 +1899,7 @@ class Synth:
         Maximum values are -8192 to +8191 (transposing by 4 semitones).
 
         """
+        self._count_events(1)
         return fluid_synth_pitch_bend(self.synth, chan, max(0, min(val + 8192, 16383)))
     def cc(self, chan, ctrl, val):
         """Send control change value
@@ -1080,16 +1915,39 @@ class Synth:
           91 : reverb
           93 : chorus
         """
+        self._count_events(1)
         return fluid_synth_cc(self.synth, chan, ctrl, val)
     def get_cc(self, chan, num):
         i=c_int()
         fluid_synth_get_cc(self.synth, chan, num, byref(i))
         return i.value
+    def send_events(self, events):
+        """Send a batch of MIDI events in one call
+
+        events is a NumPy structured array with the fields of
+        EVENT_DTYPE (type, chan, data1, data2), or an integer array
+        with one (type, chan, data1, data2) row per event.  type is one
+        of NOTE_ON, NOTE_OFF, CONTROL_CHANGE, PROGRAM_CHANGE,
+        PITCH_BEND, CHANNEL_PRESSURE or KEY_PRESSURE.  data1 holds the
+        key, controller, program or value and data2 the velocity or
+        controller value.  Pitch bend values are raw 14-bit MIDI values
+        (0 to 16383, 8192 is centered), unlike pitch_bend().
+
+        The whole batch is range checked up front and a ValueError is
+        raised before anything is sent if an event is invalid.  Events
+        are then sent in order.  Return value is the number of events.
+
+        """
+        columns = _check_events(events, self.get_setting('synth.midi-channels'))
+        _send_events(self.synth, *columns)
+        self._count_events(len(columns[0]))
+        return len(columns[0])
     def get_active_voice_count(self):
         """Get the number of currently active voices"""
         return fluid_synth_get_active_voice_count(self.synth)
     def program_change(self, chan, prg):
         """Change the program"""
+        self._count_events(1)
         return fluid_synth_program_change(self.synth, chan, prg)
     def bank_select(self, chan, bank):
         """Choose a bank"""
@@ -1109,15 +1967,308 @@ class Synth:
     def system_reset(self):
         """Stop all notes and reset all programs"""
         return fluid_synth_system_reset(self.synth)
-    def get_samples(self, len=1024):
+    def _render(self, format, len, address, loff, lincr, roff, rincr):
+        """Render len frames of stereo audio to a raw buffer address
+
+        format is 'h' for 16-bit or 'f' for float samples.  Offsets
+        and increments are counted in samples, as in libfluidsynth.
+
+        """
+        if format == 'h' and self.deterministic:
+            self._render_undithered(len, address, loff, lincr, roff, rincr)
+            return
+        write = fluid_synth_write_s16 if format == 'h' else fluid_synth_write_float
+        start = time.perf_counter()
+        write(self.synth, len, address, loff, lincr, address, roff, rincr)
+        self._record_render(time.perf_counter() - start, len)
+    def _render_undithered(self, len, address, loff, lincr, roff, rincr):
+        # fluid_synth_write_s16 adds noise from a table filled by the C library's rand(), at an
+        # index carried over from the previous call; this scales and rounds (half away from
+        # zero, then clips) as its round_clip_to_i16() does, minus the noise
+        import numpy
+        start = time.perf_counter()
+        scratch = self._scratch  # per thread, the render thread and callers don't share it
+        if getattr(scratch, 'samples', None) is None or scratch.samples.shape[1] < len:
+            scratch.samples = numpy.empty((2, len), dtype=numpy.float32)
+            scratch.halves = numpy.empty((2, len), dtype=numpy.float32)
+        size = scratch.samples.shape[1]
+        address_in = scratch.samples.ctypes.data
+        fluid_synth_write_float(self.synth, len, address_in, 0, 1, address_in, size, 1)
+        samples, halves = scratch.samples[:, :len], scratch.halves[:, :len]
+        numpy.multiply(samples, numpy.float32(32766.0), out=samples)
+        numpy.copysign(numpy.float32(0.5), samples, out=halves)
+        numpy.add(samples, halves, out=samples)
+        numpy.trunc(samples, out=samples)
+        numpy.clip(samples, -32768, 32767, out=samples)
+        span = max(loff + (len - 1) * lincr, roff + (len - 1) * rincr) + 1
+        out = numpy.ctypeslib.as_array((c_short * span).from_address(address))
+        out[loff:loff + (len - 1) * lincr + 1:lincr] = samples[0]
+        out[roff:roff + (len - 1) * rincr + 1:rincr] = samples[1]
+        self._record_render(time.perf_counter() - start, len)
+    def _record_render(self, seconds, frames):
+        bucket = bisect_left(RENDER_TIME_BUCKETS, seconds)
+        with self._stats_lock:
+            self._render_counts[bucket] += 1
+            self._render_seconds += seconds
+            self._render_frames += frames
+    def _count_events(self, count):
+        with self._stats_lock:
+            self._events += count
+    def stats(self):
+        """Return a SynthStats snapshot of the synth's load and activity
+
+        Events are those sent through this object (noteon, cc,
+        send_events...), events_per_second is measured since the
+        previous stats() call.  Render times cover every block
+        rendered through get_samples() and friends, the render
+        thread and render_midi(), but not midi2audio() or an audio
+        driver started with start().
+        """
+        now = time.monotonic()
+        with self._stats_lock:
+            last_time, last_events = self._stats_last
+            events = self._events
+            self._stats_last = (now, events)
+            render_counts = list(self._render_counts)
+            render_frames, render_seconds = self._render_frames, self._render_seconds
+        rt = self.render_thread
+        return SynthStats(
+            active_voices=fluid_synth_get_active_voice_count(self.synth),
+            polyphony=fluid_synth_get_polyphony(self.synth),
+            cpu_load=fluid_synth_get_cpu_load(self.synth),
+            events=events,
+            events_per_second=(events - last_events) / (now - last_time) if now > last_time else 0.0,
+            render_blocks=sum(render_counts),
+            render_frames=render_frames,
+            render_seconds=render_seconds,
+            render_time_buckets=tuple(zip((*RENDER_TIME_BUCKETS, math.inf),
+                                          accumulate(render_counts), strict=True)),
+            underruns=rt.underruns if rt is not None else 0,
+            overruns=rt.overruns if rt is not None else 0,
+        )
+    def _cache_key(self, kind, *parts):
+        """Hash a render request with everything else deciding its output
+
+        Covers the loaded SoundFonts' contents, every synth.*, player.*
+        and audio.file.* setting (but the output file name), the
+        reverb and chorus parameters and the library version.  Returns
+        None if a SoundFont's contents are unknown (see sfload_bytes()).
+        """
+        sfonts = []
+        for sfid in sorted({*self._sfont_files, *self._sfont_digests}):
+            path = self._sfont_files.get(sfid)
+            digest = _file_digest(path) if path is not None else self._sfont_digests[sfid]
+            if digest is None:
+                return None
+            sfonts.append(digest)
+        if self._output_setting_names is None:
+            names = []
+            fluid_settings_foreach(self.settings, None, fluid_settings_foreach_t(
+                lambda data, name, type: names.append(name.decode())))
+            self._output_setting_names = sorted(
+                name for name in names
+                if name.startswith(('synth.', 'player.', 'audio.file.', 'audio.period-size'))
+                and name != 'audio.file.name')
+        settings = [(name, self.get_setting(name)) for name in self._output_setting_names]
+        effects = (self.get_reverb_roomsize(), self.get_reverb_damp(), self.get_reverb_level(),
+                   self.get_reverb_width(), self.get_chorus_nr(), self.get_chorus_level(),
+                   self.get_chorus_speed(), self.get_chorus_depth(), self.get_chorus_type())
+        state = (kind, parts, sfonts, settings, effects, self.deterministic, _version, api_version)
+        return hashlib.sha256(repr(state).encode()).hexdigest()
+    def _cached_render(self, cache, render, kind, *parts):
+        """Return the array render() returns, from cache if it has it"""
+        key = self._cache_key(kind, *parts)
+        if key is None:
+            return render()
+        cached = cache.get(key)
+        if cached is None:
+            cached = render()
+            cache.put(key, cached)
+        return cached
+    def start_render_thread(self, frames_per_block=512, ring_capacity=8, dtype=None):
+        """Render ahead on a background thread, return the RenderThread
+
+        The thread keeps a ring of ring_capacity blocks of
+        frames_per_block frames filled; drain it with
+        RenderThread.read_into() from the audio callback.  Send events
+        to the synth as usual meanwhile.  dtype is numpy.int16 (the
+        default) or numpy.float32.  Only one render thread can run per
+        synth; delete() stops it.
+        """
+        if self.render_thread is not None and self.render_thread.is_alive():
+            raise RuntimeError("Render thread already running")
+        self.render_thread = RenderThread(self._render, frames_per_block, ring_capacity, dtype,
+                                          self.get_setting('synth.sample-rate'))
+        self.render_thread.start()
+        return self.render_thread
+    def get_samples(self, len=1024, dtype=None, layout='interleaved', sink=None):
         """Generate audio samples
 
         The return value will be a NumPy array containing the given
         length of audio samples.  If the synth is set to stereo output
         (the default) the array will be size 2 * len.
 
+        Optional keyword arguments:
+        dtype : numpy.int16 (the default) or numpy.float32; float
+        samples are nominally in the range -1.0 to 1.0 and are neither
+        dithered nor clipped
+        layout : 'interleaved' (the default) returns a flat array of
+        alternating left and right samples, 'planar' returns an array
+        of shape (2, len) holding the left and right channels
+        sink : an AudioSink that the interleaved block is also written to
+
+        """
+        import numpy
+        dtype, format = _sample_format(dtype)
+        buf = numpy.empty(len * 2, dtype=dtype)
+        if layout == 'interleaved':
+            self._render(format, len, buf.ctypes.data, 0, 2, 1, 2)
+            if sink is not None:
+                sink.write(buf)
+            return buf
+        elif layout == 'planar':
+            if sink is not None:
+                raise ValueError("Sinks take interleaved samples, not planar")
+            self._render(format, len, buf.ctypes.data, 0, 1, len, 1)
+            return buf.reshape(2, len)
+        raise ValueError(f"Unknown layout {layout!r}, use 'interleaved' or 'planar'")
+    def get_samples_into(self, out, len=None, offset=0, stride=2):
+        """Generate audio samples directly into a caller-provided buffer
+
+        out can be any writable, C-contiguous buffer: a NumPy int16 or
+        float32 array, memoryview, bytearray or mmap.  Byte buffers are
+        treated as native-endian 16-bit samples.  Nothing is allocated
+        or copied, so the same buffer can be reused for every block.
+
+        Offsets are counted in samples.  The left channel of frame i
+        is written to out[offset + i * stride] and the right channel
+        to the sample after it, so the default stride of 2 fills
+        interleaved stereo.  If len is not given, as many frames as
+        fit after offset are rendered.
+
+        Return value is the number of frames written.
+
         """
-        return fluid_synth_write_s16_stereo(self.synth, len)
+        format = 'f' if memoryview(out).format.lstrip('@=') == 'f' else 'h'
+        address, size = _buffer_address(out, format)
+        if stride < 2:
+            raise ValueError("stride must be at least 2")
+        if offset < 0:
+            raise ValueError("offset must not be negative")
+        if len is None:
+            len = (size - offset) // stride
+        if len <= 0 or offset + (len - 1) * stride + 2 > size:
+            raise ValueError(f"Output buffer of {size} samples is too small for {len} frames")
+        self._render(format, len, address, offset, stride, offset + 1, stride)
+        return len
+    def render_events(self, events, total_frames, dtype=None, out=None, cache=None):
+        """Render total_frames frames of audio with events at exact frame offsets
+
+        events is a structured array like TIMED_EVENT_DTYPE: the
+        fields of EVENT_DTYPE (see send_events) plus either a 'frame'
+        field counting frames from the start of the render or a
+        'time_s' field in seconds, sorted by time.  Rendering is split
+        internally at every distinct event time and written straight
+        into one contiguous interleaved stereo buffer, which is
+        returned.  Events at or after total_frames are not sent.
+
+        Pass out (anything get_samples_into() accepts, holding at least
+        total_frames frames) to render into an existing buffer; dtype
+        selects int16 or float32 otherwise.
+
+        libfluidsynth mixes in blocks of 64 frames and starts an event
+        with the next block, so timing is as precise as the synth
+        allows however the render is split.
+
+        With a RenderCache as cache, a render done before is read back
+        from it instead; out can't be used then.
+
+        """
+        import numpy
+        events = numpy.asarray(events)
+        if cache is not None:
+            if out is not None:
+                raise ValueError("out and cache can't be used together")
+            return self._cached_render(cache, lambda: self.render_events(events, total_frames, dtype),
+                                       'render_events', events.dtype.descr, events.tobytes(), total_frames,
+                                       _sample_format(dtype)[1])
+        frames = self._event_frames(events)
+        if frames.size and (frames[0] < 0 or (numpy.diff(frames) < 0).any()):
+            raise ValueError("events must be sorted by time and start at frame 0 or later")
+        count = int(numpy.searchsorted(frames, total_frames))
+        events, frames = events[:count], frames[:count]
+        type, chan, data1, data2 = _check_events(events, self.get_setting('synth.midi-channels'))
+
+        if out is None:
+            dtype, format = _sample_format(dtype)
+            out = numpy.empty(total_frames * 2, dtype=dtype)
+        else:
+            format = 'f' if memoryview(out).format.lstrip('@=') == 'f' else 'h'
+        address, size = _buffer_address(out, format)
+        if size < total_frames * 2:
+            raise ValueError(f"Output buffer of {size} samples is too small for {total_frames} frames")
+        frame_bytes = 2 * calcsize(format)
+
+        # index of the first event at every distinct frame, then the end
+        bounds = [*numpy.flatnonzero(numpy.diff(frames, prepend=-1)).tolist(), count]
+        frames = frames.tolist()
+        pos = 0
+        for first, end in pairwise(bounds):
+            frame = frames[first]
+            if frame > pos:
+                self._render(format, frame - pos, address + pos * frame_bytes, 0, 2, 1, 2)
+                pos = frame
+            _send_events(self.synth, type[first:end], chan[first:end], data1[first:end], data2[first:end])
+        self._count_events(count)
+        if total_frames > pos:
+            self._render(format, total_frames - pos, address + pos * frame_bytes, 0, 2, 1, 2)
+        return out
+    def _event_frames(self, events):
+        import numpy
+        names = events.dtype.names or ()
+        if 'frame' in names:
+            return events['frame'].astype(numpy.int64)
+        if 'time_s' in names:
+            samplerate = self.get_setting('synth.sample-rate')
+            return numpy.rint(events['time_s'] * samplerate).astype(numpy.int64)
+        raise ValueError("events need a 'frame' or 'time_s' field")
+    def get_group_samples(self, len=1024, out=None):
+        """Generate float audio separately for every audio group
+
+        MIDI channel n plays into audio group n % synth.audio-groups
+        (see the audio_groups argument of Synth).  The return value is
+        a float32 array of shape (groups, 2, len) holding the left and
+        right channels of every group, so a single pass renders all
+        stems of a mix.  A preallocated array of that shape can be
+        passed as out to avoid allocating a new one for every block.
+
+        Reverb and chorus are rendered per effects group and are mixed
+        into the stem of the same number; set synth.effects-groups to
+        the number of audio groups to keep effects separate per stem.
+
+        """
+        import numpy
+        groups = fluid_synth_count_audio_channels(self.synth)
+        if out is None:
+            out = numpy.zeros((groups, 2, len), dtype=numpy.float32)
+        else:
+            if out.shape != (groups, 2, len) or out.dtype != numpy.float32:
+                raise ValueError(f"out must be a float32 array of shape {(groups, 2, len)}")
+            if not out.flags.c_contiguous:
+                raise ValueError("out must be C-contiguous")
+            out.fill(0)
+        base = out.ctypes.data
+        channels = [base + i * len * out.itemsize for i in range(groups * 2)]
+        fx_channels = fluid_synth_count_effects_channels(self.synth)
+        fx_groups = min(groups, fluid_synth_count_effects_groups(self.synth))
+        # effects channel j of effects group k is written to fx[(k * fx_channels + j) * 2]
+        fx = [channels[k * 2 + side] for k in range(fx_groups) for _ in range(fx_channels) for side in (0, 1)]
+        nfx = fx_groups * fx_channels * 2
+        start = time.perf_counter()
+        fluid_synth_process(self.synth, len, nfx, (c_void_p * nfx)(*fx),
+                            groups * 2, (c_void_p * (groups * 2))(*channels))
+        self._record_render(time.perf_counter() - start, len)
+        return out
     def tuning_dump(self, bank, prog):
         """Get tuning information for given bank and preset
 
@@ -1144,12 +2295,18 @@ class Synth:
         return fluid_midi_event_get_value(event)
 
     def play_midi_file(self, filename):
+        """Play MIDI through the synth in realtime
+
+        filename is anything _player_add() takes: a file name, the
+        bytes of a MIDI file, a binary file object or a list of them,
+        played one after the other.
+        """
         self.player = new_fluid_player(self.synth)
         if self.player is None:
             return FLUID_FAILED
         if self.custom_router_callback is not None:
             fluid_player_set_playback_callback(self.player, self.custom_router_callback, self.synth)
-        status = fluid_player_add(self.player, filename.encode())
+        status = _player_add(self.player, filename)
         if status == FLUID_FAILED:
             return status
         return fluid_player_play(self.player)
@@ -1165,18 +2322,519 @@ class Synth:
     def player_set_tempo(self, tempo_type, tempo):
         return fluid_player_set_tempo(self.player, tempo_type, tempo)
 
-    def midi2audio(self, midifile, audiofile = "output.wav"):
-        """Convert a midi file to an audio file"""
+    def player_get_tick(self):
+        """Return the current position of the playing MIDI file in ticks"""
+        return fluid_player_get_current_tick(self.player)
+
+    def player_get_total_ticks(self):
+        """Return the length of the playing MIDI file in ticks"""
+        return fluid_player_get_total_ticks(self.player)
+
+    def player_get_bpm(self):
+        """Return the current tempo of the player in beats per minute"""
+        return fluid_player_get_bpm(self.player)
+
+    def player_seek(self, tick):
+        """Continue playback from the given tick
+
+        The seek happens with the synth's next block; notes sounding
+        are stopped, other events up to the tick are replayed.
+        """
+        return fluid_player_seek(self.player, tick)
+
+    def player_set_tick_callback(self, callback):
+        """Call callback(tick) whenever the player's position changes
+
+        The callback runs in the synth's audio thread (or in the thread
+        rendering samples) and should return quickly.  None removes it.
+        """
+        if callback is None:
+            self._tick_callback = None
+        else:
+            def handler(data, tick):
+                callback(tick)
+                return FLUID_OK
+            self._tick_callback = CFUNCTYPE(c_int, c_void_p, c_int)(handler)
+        return fluid_player_set_tick_callback(self.player, self._tick_callback, None)
+
+    def render_range(self, midifile, start_tick, end_tick=None, dtype=None, cache=None):
+        """Render only the part of a MIDI file between two ticks
+
+        midifile is a file name or the bytes of a MIDI file.  The
+        player seeks straight to start_tick, replaying controller and
+        program changes before it but no notes, and the window up to
+        end_tick (the last event by default) is rendered and returned
+        as one interleaved stereo array, in int16 or float32 as
+        selected by dtype.  Its length follows from the file's tempo
+        map, so consecutive windows line up exactly.
+
+        With a RenderCache as cache, windows rendered before are read
+        back from it.
+        """
+        import numpy
+        if not isinstance(midifile, (bytes, bytearray, memoryview)):
+            with open(midifile, 'rb') as f:
+                midifile = f.read()
+        if cache is not None:
+            return self._cached_render(cache, lambda: self.render_range(midifile, start_tick, end_tick, dtype),
+                                       'render_range', hashlib.sha256(midifile).hexdigest(), start_tick, end_tick,
+                                       _sample_format(dtype)[1])
+        events, tempo_map, division = _parse_midi(midifile)
+        if end_tick is None:
+            end_tick = max((event[0] for event in events), default=0)
+        if not 0 <= start_tick <= end_tick:
+            raise ValueError("Ticks must satisfy 0 <= start_tick <= end_tick")
+        start_s, end_s = _ticks_to_seconds(numpy.array([start_tick, end_tick]), tempo_map, division).tolist()
+        samplerate = self.get_setting('synth.sample-rate')
+        frames = round(end_s * samplerate) - round(start_s * samplerate)
+        dtype, format = _sample_format(dtype)
+        out = numpy.zeros(frames * 2, dtype=dtype)
+        if not frames:
+            return out
+        address, frame_bytes = out.ctypes.data, 2 * out.itemsize
+        player = new_fluid_player(self.synth)
+        try:
+            if _player_add(player, midifile) == FLUID_FAILED:
+                raise OSError(f"Couldn't load MIDI file {_midi_name(midifile)}")
+            # queued before playing, the seek is done with the synth's first 64 frame block
+            fluid_player_seek(player, start_tick)
+            fluid_player_play(player)
+            first = min(64, frames)
+            self._render(format, first, address, 0, 2, 1, 2)
+            if fluid_player_get_current_tick(player) < start_tick:
+                # the player dropped the seek while loading the file
+                fluid_player_seek(player, start_tick)
+                self._render(format, first, address, 0, 2, 1, 2)
+            if frames > first:
+                self._render(format, frames - first, address + first * frame_bytes, 0, 2, 1, 2)
+        finally:
+            fluid_player_stop(player)
+            delete_fluid_player(player)
+        return out
+
+    def midi2audio(self, midifile, audiofile = "output.wav", cache=None):
+        """Convert a midi file to an audio file
+
+        midifile can also be the bytes of a MIDI file, a binary file
+        object or a list of them, rendered one after the other.
+        Return value is the number of frames rendered, or FLUID_FAILED
+        if the MIDI file could not be loaded.
+
+        With a RenderCache as cache, files converted before are copied
+        from it instead of being rendered again.
+
+        """
+        midifile = _read_midi(midifile)
+        if not _is_midi(midifile):
+            return FLUID_FAILED
+        if cache is not None:
+            import numpy
+            midifile, digest = _midi_digest(midifile)
+            # the file type follows the extension unless audio.file.type says otherwise
+            key = self._cache_key('midi2audio', digest, os.path.splitext(os.fspath(audiofile))[1].lower())
+            if key is not None:
+                cached = cache.get(key)
+                if cached is not None:
+                    cached[8:].tofile(audiofile)
+                    return int(cached[:8].view('<i8')[0])
+                frames = self.midi2audio(midifile, audiofile)
+                if frames != FLUID_FAILED:
+                    # the frame count, then the file, copied a chunk at a time
+                    writer = cache.writer(key, numpy.uint8)
+                    try:
+                        writer.write(frames.to_bytes(8, 'little'))
+                        with open(audiofile, 'rb') as f:
+                            while chunk := f.read(1 << 20):
+                                writer.write(chunk)
+                        writer.commit()
+                    finally:
+                        writer.close()
+                return frames
         self.setting("audio.file.name", audiofile)
         player = new_fluid_player(self.synth)
-        fluid_player_add(player, midifile.encode())
+        if _player_queue(player, midifile) == FLUID_FAILED:
+            delete_fluid_player(player)
+            return FLUID_FAILED
         fluid_player_play(player)
         renderer = new_fluid_file_renderer(self.synth)
+        blocks = 0
         while fluid_player_get_status(player) == FLUID_PLAYER_PLAYING:
             if fluid_file_renderer_process_block(renderer) != FLUID_OK:
                 break
+            blocks += 1
         delete_fluid_file_renderer(renderer)
         delete_fluid_player(player)
+        return blocks * self.get_setting('audio.period-size')
+
+    def render_midi(self, midifile, chunk_frames=65536, dtype=None, sink=None, cache=None):
+        """Render a MIDI file to audio in large blocks
+
+        midifile can be anything midi2audio() takes.
+        Without a sink this returns a generator yielding interleaved
+        stereo NumPy arrays of chunk_frames frames each, in int16 or
+        float32 as selected by dtype (see get_samples).  With an
+        AudioSink, every block is written to the sink through a single
+        reused buffer and the number of frames rendered is returned.
+
+        The MIDI player is driven by the synth's own sample clock, so
+        events are placed exactly as in realtime playback while the
+        player status is only checked once per chunk.  The last chunk
+        may run past the end of the song.
+
+        With a RenderCache as cache, songs rendered before are read
+        back from it, the blocks then being slices of one memory-mapped
+        array.  Blocks are streamed to the cache as they are rendered,
+        and a song is only stored once all of it has been rendered.
+
+        """
+        key = None
+        if cache is not None and _is_midi(midifile := _read_midi(midifile)):
+            midifile, digest = _midi_digest(midifile)
+            key = self._cache_key('render_midi', digest, chunk_frames, _sample_format(dtype)[1])
+        if key is None:
+            blocks = self._render_midi_blocks(midifile, chunk_frames, dtype, reuse=sink is not None)
+        else:
+            blocks = self._cached_midi_blocks(cache, key, midifile, chunk_frames, dtype, reuse=sink is not None)
+        if sink is None:
+            return blocks
+        frames = 0
+        for block in blocks:
+            sink.write(block)
+            frames += chunk_frames
+        return frames
+
+    def _cached_midi_blocks(self, cache, key, midifile, chunk_frames, dtype, reuse=False):
+        cached = cache.get(key)
+        if cached is not None:
+            for start in range(0, len(cached), chunk_frames * 2):
+                yield cached[start:start + chunk_frames * 2]
+            return
+        blocks = self._render_midi_blocks(midifile, chunk_frames, dtype, reuse)
+        writer = cache.writer(key, _sample_format(dtype)[0])
+        try:
+            for block in blocks:
+                writer.write(block)
+                yield block
+            writer.commit()
+        finally:
+            writer.close()
+    def _render_midi_blocks(self, midifile, chunk_frames, dtype, reuse=False):
+        import numpy
+        dtype, format = _sample_format(dtype)
+        name = _midi_name(midifile)
+        midifile = _read_midi(midifile)
+        if not _is_midi(midifile):
+            raise OSError(f"Couldn't load MIDI file {name}")
+        player = new_fluid_player(self.synth)
+        try:
+            if _player_queue(player, midifile) == FLUID_FAILED:
+                raise OSError(f"Couldn't load MIDI file {name}")
+            fluid_player_play(player)
+            buf = None
+            while fluid_player_get_status(player) == FLUID_PLAYER_PLAYING:
+                if buf is None or not reuse:
+                    buf = numpy.empty(chunk_frames * 2, dtype=dtype)
+                self._render(format, chunk_frames, buf.ctypes.data, 0, 2, 1, 2)
+                yield buf
+        finally:
+            delete_fluid_player(player)
+
+class RenderThread(threading.Thread):
+    """Background thread rendering a synth into a ring buffer
+
+    Created by Synth.start_render_thread().  Each block is rendered by
+    a single ctypes call, which releases the GIL, straight into
+    preallocated ring memory, so rendering neither waits for Python
+    code running in other threads nor allocates anything.  The thread
+    renders until the ring is full and resumes as read_into() frees
+    blocks, so the ring size bounds the output latency.
+
+    Counters for monitoring:
+    underruns : read_into() calls that found too little audio and
+    padded with silence, underrun_frames the silent frames inserted
+    overruns : blocks that took longer to render than to play
+    """
+    def __init__(self, render, frames_per_block, ring_capacity, dtype, samplerate):
+        import numpy
+        super().__init__(name='fluidsynth-render', daemon=True)
+        if frames_per_block < 1 or ring_capacity < 1:
+            raise ValueError("frames_per_block and ring_capacity must be at least 1")
+        dtype, self._format = _sample_format(dtype)
+        self._render_block = render
+        self.frames_per_block = frames_per_block
+        self.ring_capacity = ring_capacity
+        self.block_seconds = frames_per_block / samplerate
+        self._ring = numpy.zeros((ring_capacity, frames_per_block * 2), dtype=dtype)
+        # blocks written and read so far, each only advanced by one side
+        self._written = 0
+        self._read = 0
+        self._offset = 0  # samples already read from the oldest block
+        self._space = threading.Condition()
+        self._stopped = False
+        self.underruns = 0
+        self.underrun_frames = 0
+        self.overruns = 0
+
+    @property
+    def available(self):
+        """Frames ready to be read"""
+        return ((self._written - self._read) * self._ring.shape[1] - self._offset) // 2
+
+    def run(self):
+        ring, cap, frames, format = self._ring, self.ring_capacity, self.frames_per_block, self._format
+        addresses = [ring[i].ctypes.data for i in range(cap)]
+        while True:
+            with self._space:
+                while self._written - self._read >= cap and not self._stopped:
+                    self._space.wait()
+                if self._stopped:
+                    return
+            start = time.perf_counter()
+            self._render_block(format, frames, addresses[self._written % cap], 0, 2, 1, 2)
+            if time.perf_counter() - start > self.block_seconds:
+                self.overruns += 1
+            self._written += 1
+
+    def read_into(self, out):
+        """Copy the next frames into out, return the number of frames
+
+        out is a writable buffer (NumPy array, bytearray...) of the
+        thread's sample type or plain bytes, holding interleaved
+        stereo samples; it is filled completely, with silence where
+        the render thread hasn't caught up.
+        """
+        import numpy
+        _buffer_address(out, self._format)  # validates out
+        dst = numpy.frombuffer(out, self._ring.dtype)
+        need, pos = dst.size, 0
+        block_size = self._ring.shape[1]
+        while pos < need and self._read < self._written:
+            block = self._ring[self._read % self.ring_capacity]
+            n = min(need - pos, block_size - self._offset)
+            dst[pos:pos + n] = block[self._offset:self._offset + n]
+            pos += n
+            self._offset += n
+            if self._offset == block_size:
+                self._offset = 0
+                with self._space:
+                    self._read += 1
+                    self._space.notify()
+        if pos < need:
+            dst[pos:] = 0
+            self.underruns += 1
+            self.underrun_frames += (need - pos) // 2
+        return need // 2
+
+    def read(self, frames):
+        """Return the next frames as a new NumPy array, see read_into()"""
+        import numpy
+        out = numpy.empty(frames * 2, dtype=self._ring.dtype)
+        self.read_into(out)
+        return out
+
+    def stop(self):
+        """Stop rendering and wait for the thread to finish"""
+        with self._space:
+            self._stopped = True
+            self._space.notify()
+        if self.is_alive() and self is not threading.current_thread():
+            self.join()
+
+
+# upper bounds, in seconds, of the render time histogram in SynthStats
+RENDER_TIME_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+def _openmetrics_labels(labels):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return ','.join(f'{name}="{escape(value)}"' for name, value in labels.items())
+
+class SynthStats(NamedTuple):
+    """Snapshot of a synth's load and activity, returned by Synth.stats()
+
+    render_time_buckets holds (upper bound in seconds, number of
+    blocks rendered at most that fast) pairs, cumulative like a
+    Prometheus histogram and ending with infinity.  underruns and
+    overruns come from the render thread (see RenderThread), if any.
+    """
+    active_voices: int
+    polyphony: int
+    cpu_load: float
+    events: int
+    events_per_second: float
+    render_blocks: int
+    render_frames: int
+    render_seconds: float
+    render_time_buckets: tuple
+    underruns: int
+    overruns: int
+
+    def openmetrics(self, prefix='fluidsynth', labels=None, eof=True):
+        """Return the stats in the OpenMetrics (Prometheus) text format
+
+        labels is a dict of labels added to every sample, e.g. to tell
+        synths apart.  Pass eof=False to concatenate the output of
+        several synths, then end it with '# EOF'.
+        """
+        base = _openmetrics_labels(labels or {})
+        braced = f'{{{base}}}' if base else ''
+        lines = []
+        for name, kind, value in (
+            ('active_voices', 'gauge', self.active_voices),
+            ('polyphony', 'gauge', self.polyphony),
+            ('cpu_load', 'gauge', self.cpu_load),
+            ('events', 'counter', self.events),
+            ('render_frames', 'counter', self.render_frames),
+            ('underruns', 'counter', self.underruns),
+            ('overruns', 'counter', self.overruns),
+        ):
+            lines.append(f'# TYPE {prefix}_{name} {kind}')
+            lines.append(f'{prefix}_{name}{"_total" if kind == "counter" else ""}{braced} {value}')
+        lines.append(f'# TYPE {prefix}_render_seconds histogram')
+        lines.append(f'# UNIT {prefix}_render_seconds seconds')
+        for bound, blocks in self.render_time_buckets:
+            le = '+Inf' if bound == math.inf else repr(bound)
+            lines.append(f'{prefix}_render_seconds_bucket{{{base + "," if base else ""}le="{le}"}} {blocks}')
+        lines.append(f'{prefix}_render_seconds_count{braced} {self.render_blocks}')
+        lines.append(f'{prefix}_render_seconds_sum{braced} {self.render_seconds}')
+        if eof:
+            lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+
+class RenderCache:
+    """Disk cache of rendered audio, keyed by the content of everything that decides it
+
+    Pass it as the cache argument of Synth.midi2audio(),
+    render_midi(), render_range() and render_events().  The key is
+    a hash of the MIDI data (or events), the render arguments, the
+    contents of the synth's SoundFonts, its output settings, reverb
+    and chorus parameters and the libfluidsynth version.  What was
+    done to the synth before the render (notes held, controllers,
+    program selections) is not part of the key, so use a cache with
+    synths in their reset state.  Synths holding a SoundFont loaded
+    from memory without cacheable=True (see Synth.sfload_bytes()) or
+    from a file object render without the cache.
+
+    Entries are .npy files in directory, read back memory-mapped.
+    Once they take more than max_bytes, the least recently used ones
+    are removed.  Several processes can share a directory.
+    """
+    def __init__(self, directory, max_bytes=1 << 30):
+        self.directory = os.path.expanduser(os.fspath(directory))
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.npy')
+
+    def get(self, key):
+        """Return the array stored under key, memory-mapped read-only, or None"""
+        import numpy
+        path = self._path(key)
+        try:
+            array = numpy.load(path, mmap_mode='r')
+            os.utime(path)  # the modification time orders entries for eviction
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return array
+
+    def _tmp_path(self, key):
+        return f'{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp'
+
+    def put(self, key, array):
+        """Store an array under key, then evict entries beyond max_bytes"""
+        import numpy
+        path = self._path(key)
+        tmp = self._tmp_path(key)
+        try:
+            with open(tmp, 'wb') as f:
+                numpy.save(f, numpy.ascontiguousarray(array))
+            os.replace(tmp, path)
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return
+        self._evict()
+
+    def writer(self, key, dtype):
+        """Return a _RenderCacheWriter storing a 1-D array under key as it is written"""
+        return _RenderCacheWriter(self._tmp_path(key), self._path(key), dtype, self._evict)
+
+    def _evict(self):
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith('.npy'):
+                    st = entry.stat()
+                    entries.append((st.st_mtime_ns, st.st_size, entry.path))
+                    total += st.st_size
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue  # already gone, or still mapped on Windows
+            total -= size
+
+    def clear(self):
+        """Remove every entry"""
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith('.npy'):
+                    os.remove(entry.path)
+
+
+class _RenderCacheWriter:
+    """Streams blocks into a RenderCache entry, see RenderCache.writer()
+
+    Blocks go straight to a temporary file, so caching a long render
+    holds no more than one block in memory.  commit() makes the entry
+    visible; close() without commit() discards it.
+    """
+    # .npy header of a fixed size, so the length can be filled in last
+    _header_size = 128
+
+    def __init__(self, tmp, path, dtype, committed):
+        import numpy
+        self._tmp = tmp
+        self._path = path
+        self._dtype = numpy.dtype(dtype)
+        self._length = 0
+        self._committed = committed
+        self._file = open(self._tmp, 'wb')  # noqa: SIM115
+        self._file.write(self._header())
+
+    def _header(self):
+        header = repr({'descr': self._dtype.str, 'fortran_order': False, 'shape': (self._length,)})
+        size = self._header_size - 10
+        return b'\x93NUMPY\x01\x00' + size.to_bytes(2, 'little') + header.encode('latin1').ljust(size - 1) + b'\n'
+
+    def write(self, block):
+        """Append the samples of a 1-D array of the writer's dtype, or bytes to a uint8 entry"""
+        self._file.write(memoryview(block).cast('B'))
+        self._length += len(block)
+
+    def commit(self):
+        """Store the entry, then evict entries beyond the cache's max_bytes"""
+        self._file.seek(0)
+        self._file.write(self._header())
+        self._file.close()
+        os.replace(self._tmp, self._path)
+        self._committed()
+
+    def close(self):
+        """Discard the entry unless it was committed"""
+        if not self._file.closed:
+            self._file.close()
+            os.remove(self._tmp)
+
 
 # flag values
 FLUID_MOD_POSITIVE = 0
@@ -1311,6 +2969,58 @@ class Modulator:
             raise Exception("Modulation identity check failed")
         return response
 
+class SequencerEvent(NamedTuple):
+    """A sequencer event delivered to a client, copied out of libfluidsynth
+
+    type is one of the FLUID_SEQ_* constants; key and velocity are
+    only meaningful for note events, data for timer events.  Events
+    of queue clients leave out what they weren't asked to copy as
+    None (see Sequencer.register_queue_client()).
+    """
+    time: int
+    type: int
+    source: int | None
+    dest: int
+    channel: int | None
+    key: int | None
+    velocity: int | None
+    data: int | None
+
+_event_getters = None
+
+def _sequencer_event_getters():
+    """Return the fluid_event_get_* functions of the SequencerEvent fields, in order
+
+    They keep the GIL: each is a field read, and they are called from
+    client callbacks running in libfluidsynth's thread.
+    """
+    global _event_getters  # noqa: PLW0603
+    if _event_getters is None:
+        _event_getters = (
+            _bare_cfunc('fluid_event_get_type', c_int, c_void_p, release_gil=False),
+            _bare_cfunc('fluid_event_get_source', c_short, c_void_p, release_gil=False),
+            _bare_cfunc('fluid_event_get_dest', c_short, c_void_p, release_gil=False),
+            _bare_cfunc('fluid_event_get_channel', c_int, c_void_p, release_gil=False),
+            _bare_cfunc('fluid_event_get_key', c_short, c_void_p, release_gil=False),
+            _bare_cfunc('fluid_event_get_velocity', c_short, c_void_p, release_gil=False),
+            _bare_cfunc('fluid_event_get_data', c_void_p, c_void_p, release_gil=False),
+        )
+    return _event_getters
+
+def _copy_sequencer_event(time, event):
+    """Copy an event handed to a sequencer client into a SequencerEvent"""
+    type, source, dest, channel, key, velocity, data = _sequencer_event_getters()
+    return SequencerEvent(time, type(event), source(event), dest(event), channel(event),
+                          key(event), velocity(event), data(event))
+
+def _queued_sequencer_event(item):
+    """Turn a tuple queued by a queue client into a SequencerEvent"""
+    if len(item) == 4:
+        time, type, dest, data = item
+        return SequencerEvent(time, type, None, dest, None, None, None, data)
+    time, type, dest, data, channel, key, velocity = item
+    return SequencerEvent(time, type, None, dest, channel, key, velocity, data)
+
 class Sequencer:
     def __init__(self, time_scale=1000, use_system_timer=True):
         """Create new sequencer object to control and schedule timing of midi events
@@ -1322,11 +3032,19 @@ class Sequencer:
         self.client_callbacks = []
         self.sequencer = new_fluid_sequencer2(use_system_timer)
         fluid_sequencer_set_time_scale(self.sequencer, time_scale)
+        # the sequencer copies events when scheduling them, so a single
+        # event is reused for everything sent through this object
+        self._event = new_fluid_event()
+        self._event_lock = threading.Lock()
+        self._queue = None
+        # MIDI channel count of each registered synth, by client id
+        self._synth_channels = {}
 
     def register_fluidsynth(self, synth):
         response = fluid_sequencer_register_fluidsynth(self.sequencer, synth.synth)
         if response == FLUID_FAILED:
             raise Exception("Registering fluid synth failed")
+        self._synth_channels[response] = synth.get_setting('synth.midi-channels')
         return response
 
     def register_client(self, name, callback, data=None):
@@ -1340,32 +3058,149 @@ class Sequencer:
 
         return response
 
+    def register_queue_client(self, name, maxlen=None, notify=None, notes=False):
+        """Register a client whose events are queued for poll_events()
+
+        No user code runs when the client receives an event: its type,
+        dest and data fields are copied into a tuple by getters that
+        keep the GIL and appended to a queue, which poll_events()
+        drains in batches.  The other SequencerEvent fields are None.
+        All queue clients of a sequencer share one queue; tell them
+        apart by the dest field.
+
+        Optional keyword arguments:
+        maxlen : bound on the queue length, the oldest events are dropped
+        beyond it; set by the first queue client, later ones can only
+        repeat it (ValueError otherwise) or leave it out
+        notify : called without arguments, in libfluidsynth's thread,
+        when an event arrives in an empty queue
+        notes : also copy channel, key and velocity, for clients that
+        receive note events
+        """
+        if self._queue is None:
+            self._queue = deque(maxlen=maxlen)
+        elif maxlen is not None and maxlen != self._queue.maxlen:
+            raise ValueError(f"Queue clients share one queue, its maxlen is already {self._queue.maxlen}")
+        append = self._queue.append
+        type, _, dest, channel, key, velocity, data = _sequencer_event_getters()
+        # unrolled on purpose, this runs for every event in libfluidsynth's thread
+        if notes:
+            def copy(time, event):
+                return (time, type(event), dest(event), data(event), channel(event), key(event), velocity(event))
+        else:
+            def copy(time, event):
+                return (time, type(event), dest(event), data(event))
+        if notify is None:
+            def enqueue(time, event, seq, data):
+                append(copy(time, event))
+        else:
+            queue = self._queue
+            def enqueue(time, event, seq, data):
+                append(copy(time, event))
+                # checked after appending: the consumer may have emptied the queue meanwhile
+                if len(queue) == 1:
+                    notify()
+        return self.register_client(name, enqueue)
+
+    def poll_events(self, max_events=None):
+        """Return the events queued for queue clients, oldest first
+
+        At most max_events are taken, the rest stay queued.
+        """
+        queue = self._queue
+        if not queue:
+            return []
+        n = len(queue) if max_events is None else min(max_events, len(queue))
+        return [_queued_sequencer_event(queue.popleft()) for _ in range(n)]
+
     def note(self, time, channel, key, velocity, duration, source=-1, dest=-1, absolute=True):
-        evt = self._create_event(source, dest)
-        fluid_event_note(evt, channel, key, velocity, duration)
-        self._schedule_event(evt, time, absolute)
-        delete_fluid_event(evt)
+        with self._event_lock:
+            evt = self._create_event(source, dest)
+            fluid_event_note(evt, channel, key, velocity, duration)
+            self._schedule_event(evt, time, absolute)
 
     def note_on(self, time, channel, key, velocity=127, source=-1, dest=-1, absolute=True):
-        evt = self._create_event(source, dest)
-        fluid_event_noteon(evt, channel, key, velocity)
-        self._schedule_event(evt, time, absolute)
-        delete_fluid_event(evt)
+        with self._event_lock:
+            evt = self._create_event(source, dest)
+            fluid_event_noteon(evt, channel, key, velocity)
+            self._schedule_event(evt, time, absolute)
 
     def note_off(self, time, channel, key, source=-1, dest=-1, absolute=True):
-        evt = self._create_event(source, dest)
-        fluid_event_noteoff(evt, channel, key)
-        self._schedule_event(evt, time, absolute)
-        delete_fluid_event(evt)
+        with self._event_lock:
+            evt = self._create_event(source, dest)
+            fluid_event_noteoff(evt, channel, key)
+            self._schedule_event(evt, time, absolute)
 
     def timer(self, time, data=None, source=-1, dest=-1, absolute=True):
-        evt = self._create_event(source, dest)
-        fluid_event_timer(evt, data)
-        self._schedule_event(evt, time, absolute)
-        delete_fluid_event(evt)
+        with self._event_lock:
+            evt = self._create_event(source, dest)
+            fluid_event_timer(evt, data)
+            self._schedule_event(evt, time, absolute)
+
+    def schedule_many(self, events, source=-1, dest=-1, absolute=True):
+        """Schedule a whole batch of events in one call
+
+        events is a structured array with the fields of
+        SEQUENCER_EVENT_DTYPE: time (in ticks), type, chan, data1,
+        data2 and duration.  type is one of the MIDI event types taken
+        by Synth.send_events(); a NOTE_ON with a non-zero duration is
+        scheduled as a complete note that turns itself off.  All events
+        go from source to dest.  The batch is checked before anything
+        is scheduled, with channels limited to the synth.midi-channels
+        of the destination synth (of every registered synth when dest
+        is -1).  Return value is the number of events scheduled.
+
+        """
+        type, chan, data1, data2, time, duration = self._check_sequencer_events(events, dest)
+        funcs = _sequencer_event_funcs()
+        note, noteon, noteoff, control_change, program_change, pitch_bend, channel_pressure, key_pressure, send_at = funcs
+        seq = self.sequencer
+        with self._event_lock:
+            evt = self._create_event(source, dest)
+            for t, c, d1, d2, tick, dur in zip(type, chan, data1, data2, time, duration, strict=True):
+                if t == NOTE_ON:
+                    if dur:
+                        note(evt, c, d1, d2, dur)
+                    else:
+                        noteon(evt, c, d1, d2)
+                elif t == NOTE_OFF:
+                    noteoff(evt, c, d1)
+                elif t == CONTROL_CHANGE:
+                    control_change(evt, c, d1, d2)
+                elif t == PROGRAM_CHANGE:
+                    program_change(evt, c, d1)
+                elif t == PITCH_BEND:
+                    pitch_bend(evt, c, d1)
+                elif t == CHANNEL_PRESSURE:
+                    channel_pressure(evt, c, d1)
+                else:
+                    key_pressure(evt, c, d1, d2)
+                if send_at(seq, evt, tick, absolute) == FLUID_FAILED:
+                    raise Exception("Scheduling event failed")
+        return len(time)
+
+    def _check_sequencer_events(self, events, dest):
+        """Validate events for schedule_many() and return their columns as lists"""
+        import numpy
+        events = numpy.asarray(events)
+        if not events.dtype.names or 'time' not in events.dtype.names:
+            raise ValueError("events must be a structured array with the fields of SEQUENCER_EVENT_DTYPE")
+        type, chan, data1, data2 = _check_events(events, self._dest_channels(dest))
+        time = events['time'].tolist()
+        duration = events['duration'].tolist() if 'duration' in events.dtype.names else [0] * len(time)
+        return type, chan, data1, data2, time, duration
+
+    def _dest_channels(self, dest):
+        """Return the number of MIDI channels events to dest may use"""
+        if dest in self._synth_channels:
+            return self._synth_channels[dest]
+        if dest == -1 and self._synth_channels:
+            return min(self._synth_channels.values())
+        # other clients take any channel the event can hold
+        return 2**31
 
     def _create_event(self, source=-1, dest=-1):
-        evt = new_fluid_event()
+        evt = self._event
         fluid_event_set_source(evt, source)
         fluid_event_set_dest(evt, dest)
         return evt
@@ -1382,8 +3217,123 @@ class Sequencer:
         fluid_sequencer_process(self.sequencer, msec)
 
     def delete(self):
+        delete_fluid_event(self._event)
         delete_fluid_sequencer(self.sequencer)
 
+class AudioSink:
+    """Base class for streaming audio writers
+
+    A sink takes blocks of interleaved samples through write() and
+    passes them on to its file as they arrive, so memory use stays
+    bounded no matter how long the render is.  file is either a file
+    name, which the sink opens and closes, or a binary file object.
+    Sinks are context managers; leaving the with block closes them.
+
+    """
+    def __init__(self, file, channels=2, dtype=None):
+        import numpy
+        if isinstance(file, (str, os.PathLike)):
+            self.file = open(file, 'wb')  # noqa: SIM115
+            self._owns_file = True
+        else:
+            self.file = file
+            self._owns_file = False
+        self.channels = channels
+        self.dtype = numpy.dtype(dtype or numpy.int16)
+        self.frames = 0
+
+    def write(self, samples):
+        """Append a block of interleaved samples (NumPy array or bytes)"""
+        import numpy
+        if isinstance(samples, numpy.ndarray) and samples.dtype != self.dtype:
+            raise TypeError(f"Sink expects {self.dtype} samples, got {samples.dtype}")
+        data = memoryview(samples).cast('B')
+        self._write(data)
+        self.frames += data.nbytes // (self.dtype.itemsize * self.channels)
+
+    def _write(self, data):
+        self.file.write(data)
+
+    def close(self):
+        """Flush the sink and close its file if the sink opened it"""
+        if self._owns_file:
+            self.file.close()
+        else:
+            self.file.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class RawSink(AudioSink):
+    """Write headerless PCM samples, exactly as rendered"""
+
+
+class WavSink(AudioSink):
+    """Write a WAV file, 16-bit PCM or 32-bit float
+
+    The header is written up front with placeholder sizes and patched
+    on close.  If the file is not seekable (a pipe, for instance) the
+    sizes are left at their maximum, as streaming WAV readers expect.
+
+    """
+    def __init__(self, file, samplerate=44100, channels=2, dtype=None):
+        super().__init__(file, channels, dtype)
+        self.samplerate = samplerate
+        self._header_start = self.file.tell() if self.file.seekable() else None
+        self.file.write(self._header(0xFFFFFFFF))
+
+    def _header(self, data_size):
+        from struct import pack
+        is_float = self.dtype.kind == 'f'
+        width = self.dtype.itemsize
+        fmt = pack('<HHIIHH', 3 if is_float else 1, self.channels, self.samplerate,
+                   self.samplerate * self.channels * width, self.channels * width, width * 8)
+        chunks = b'WAVE'
+        if is_float:
+            # non-PCM formats carry a cbSize field and a fact chunk with the frame count
+            chunks += b'fmt ' + pack('<I', len(fmt) + 2) + fmt + pack('<H', 0)
+            frames = data_size // (self.channels * width) if data_size != 0xFFFFFFFF else 0xFFFFFFFF
+            chunks += b'fact' + pack('<II', 4, frames)
+        else:
+            chunks += b'fmt ' + pack('<I', len(fmt)) + fmt
+        chunks += b'data' + pack('<I', data_size)
+        riff_size = min(len(chunks) + data_size, 0xFFFFFFFF)
+        return b'RIFF' + pack('<I', riff_size) + chunks
+
+    def close(self):
+        if self._header_start is not None:
+            end = self.file.tell()
+            data_size = self.frames * self.channels * self.dtype.itemsize
+            self.file.seek(self._header_start)
+            self.file.write(self._header(min(data_size, 0xFFFFFFFF)))
+            self.file.seek(end)
+        super().close()
+
+
+class FlacSink(AudioSink):
+    """Write a 16-bit FLAC file, requires the soundfile package"""
+    def __init__(self, file, samplerate=44100, channels=2, dtype=None):
+        try:
+            import soundfile
+        except ImportError:
+            raise ImportError("FlacSink requires the soundfile package: pip install soundfile") from None
+        super().__init__(file, channels, dtype)
+        self.samplerate = samplerate
+        self._sf = soundfile.SoundFile(self.file, 'w', samplerate, channels, 'PCM_16', format='FLAC')
+
+    def _write(self, data):
+        import numpy
+        self._sf.write(numpy.frombuffer(data, dtype=self.dtype).reshape(-1, self.channels))
+
+    def close(self):
+        self._sf.close()
+        super().close()
+
+
 def raw_audio_string(data):
     """Return a string of bytes to send to soundcard
 
@@ -1393,3 +3343,711 @@ def raw_audio_string(data):
     """
     import numpy
     return (data.astype(numpy.int16)).tobytes()
+
+def _read_varlen(data, pos):
+    """Read a MIDI variable-length quantity, return it and the next position"""
+    value = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value = (value << 7) | (byte & 0x7F)
+        if byte < 0x80:
+            return value, pos
+
+def _parse_midi_track(data, pos, end, track, events, tempo_map):
+    """Append the channel events of one MTrk chunk body to events
+
+    Tempo changes are appended to tempo_map as (tick, microseconds per
+    quarter note).  Raises IndexError on truncated data.
+    """
+    tick = status = 0
+    while pos < end:
+        delta, pos = _read_varlen(data, pos)
+        tick += delta
+        byte = data[pos]
+        if byte == 0xFF:  # meta event
+            meta = data[pos + 1]
+            length, pos = _read_varlen(data, pos + 2)
+            if meta == 0x51 and length == 3:
+                tempo_map.append((tick, int.from_bytes(data[pos:pos + 3], 'big')))
+            pos += length
+            continue
+        if byte in (0xF0, 0xF7):  # system exclusive, cancels running status
+            length, pos = _read_varlen(data, pos + 1)
+            pos += length
+            status = 0
+            continue
+        if byte & 0x80:
+            status = byte
+            pos += 1
+        kind = status & 0xF0
+        if kind < NOTE_OFF or kind > PITCH_BEND:
+            raise ValueError(f"Invalid MIDI data in track {track}")
+        if kind in (PROGRAM_CHANGE, CHANNEL_PRESSURE):
+            data1, data2 = data[pos], 0
+            pos += 1
+        else:
+            data1, data2 = data[pos], data[pos + 1]
+            pos += 2
+        if kind == NOTE_ON and data2 == 0:
+            kind = NOTE_OFF
+        elif kind == PITCH_BEND:
+            data1, data2 = data1 | data2 << 7, 0
+        events.append((tick, kind, status & 0x0F, data1, data2, track))
+
+def _ticks_to_seconds(ticks, tempo_map, division):
+    """Convert MIDI ticks to seconds, vectorized over a NumPy array"""
+    import numpy
+    if division < 0:
+        # SMPTE time: frames per second in the high byte (negated), ticks per frame in the low one
+        fps = -(division >> 8)
+        return ticks / ((29.97 if fps == 29 else fps) * (division & 0xFF))
+    tempo_map = sorted(tempo_map, key=lambda change: change[0])  # stable, later changes win
+    segment_ticks = numpy.array([tick for tick, _ in tempo_map], dtype=numpy.int64)
+    seconds_per_tick = numpy.array([tempo for _, tempo in tempo_map], dtype=numpy.float64) / 1e6 / division
+    # start time of every tempo segment
+    segment_starts = numpy.concatenate(([0.0], numpy.cumsum(numpy.diff(segment_ticks) * seconds_per_tick[:-1])))
+    segment = numpy.searchsorted(segment_ticks, ticks, side='right') - 1
+    return segment_starts[segment] + (ticks - segment_ticks[segment]) * seconds_per_tick[segment]
+
+def _parse_midi(data):
+    """Parse the bytes of a Standard MIDI File
+
+    Return value is (events, tempo_map, division): the channel events
+    as (tick, type, chan, data1, data2, track) tuples in track order,
+    the tempo changes as (tick, microseconds per quarter note) and the
+    header's time division.
+    """
+    data = bytes(data)
+    if len(data) < 14 or not data.startswith(b'MThd'):
+        raise ValueError("Not a Standard MIDI File")
+    _, ntracks, division = unpack_from('>HHh', data, 8)
+    pos = 8 + int.from_bytes(data[4:8], 'big')
+    events = []
+    tempo_map = [(0, 500000)]  # 120 bpm until set
+    track = 0
+    try:
+        while track < ntracks:
+            end = pos + 8 + int.from_bytes(data[pos + 4:pos + 8], 'big')
+            if end > len(data):
+                raise IndexError
+            if data.startswith(b'MTrk', pos):  # other chunk types are skipped
+                _parse_midi_track(data, pos + 8, end, track, events, tempo_map)
+                track += 1
+            pos = end
+    except IndexError:
+        raise ValueError("Truncated MIDI file") from None
+    return events, tempo_map, division
+
+def load_midi(midifile):
+    """Parse a Standard MIDI File into an array of channel events
+
+    midifile is a file name or the bytes of a MIDI file.  The result
+    is a structured array with the fields of MIDI_FILE_EVENT_DTYPE:
+    tick, time_s (seconds from the start, following the file's tempo
+    map), the EVENT_DTYPE fields and the track number, sorted by time.
+    It can be passed as is to Synth.send_events() and
+    Synth.render_events(), which uses time_s.
+
+    A note-on with velocity 0 becomes a NOTE_OFF; pitch bends hold the
+    raw 14-bit value in data1, as send_events() expects.  Meta and
+    system exclusive events are not included.  Raises ValueError if
+    the data isn't a valid MIDI file.
+    """
+    import numpy
+    if not isinstance(midifile, (bytes, bytearray, memoryview)):
+        with open(midifile, 'rb') as f:
+            midifile = f.read()
+    events, tempo_map, division = _parse_midi(midifile)
+    fields = [(name, dtype) for name, dtype in MIDI_FILE_EVENT_DTYPE if name != 'time_s']
+    parsed = numpy.array(events, dtype=fields)
+    parsed = parsed[numpy.argsort(parsed['tick'], kind='stable')]
+    table = numpy.empty(len(parsed), dtype=MIDI_FILE_EVENT_DTYPE)
+    for name in parsed.dtype.names:
+        table[name] = parsed[name]
+    table['time_s'] = _ticks_to_seconds(parsed['tick'], tempo_map, division)
+    return table
+
+# Batch rendering of MIDI files in a pool of worker processes
+
+class RenderResult(NamedTuple):
+    """Outcome of one render_batch() job, error is None on success"""
+    midifile: str
+    audiofile: str
+    error: str | None
+    render_seconds: float
+    audio_seconds: float
+
+
+class RenderStats:
+    """Running totals and throughput of a render_batch() call"""
+    def __init__(self):
+        self.files = 0
+        self.failed = 0
+        self.audio_seconds = 0.0
+        self.start_time = time.perf_counter()
+        self.elapsed = 0.0
+
+    def add(self, result):
+        self.files += 1
+        if result.error is not None:
+            self.failed += 1
+        self.audio_seconds += result.audio_seconds
+        self.elapsed = time.perf_counter() - self.start_time
+
+    @property
+    def files_per_second(self):
+        return self.files / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def audio_seconds_per_second(self):
+        """Seconds of audio rendered per wall-clock second, across all workers"""
+        return self.audio_seconds / self.elapsed if self.elapsed else 0.0
+
+
+# Each worker process keeps one warmed up synth for all of its jobs
+_batch_synth = None
+
+def _batch_init(soundfonts, synth_kwargs):
+    global _batch_synth  # noqa: PLW0603
+    _batch_synth = Synth(**synth_kwargs)
+    for soundfont in soundfonts:
+        if _batch_synth.sfload(soundfont) == FLUID_FAILED:
+            raise OSError(f"Couldn't load SoundFont {soundfont}")
+
+def _batch_render(midifile, audiofile):
+    start = time.perf_counter()
+    error = None
+    frames = 0
+    try:
+        frames = _batch_synth.midi2audio(midifile, audiofile)
+        if frames == FLUID_FAILED:
+            error = f"Couldn't load MIDI file {midifile}"
+            frames = 0
+    except Exception as e:  # noqa: BLE001
+        error = repr(e)
+    finally:
+        _batch_synth.system_reset()
+    audio_seconds = frames / _batch_synth.get_setting('synth.sample-rate')
+    return RenderResult(midifile, audiofile, error, time.perf_counter() - start, audio_seconds)
+
+# SoundFonts pinned in memory by preload_soundfont(), file name -> ID in _preload_synth
+_preloaded = {}
+_preload_synth = None
+_preload_lock = threading.Lock()
+
+def preload_soundfont(filename):
+    """Load a SoundFont's sample data once and keep it in memory
+
+    The data stays in libfluidsynth's sample cache until
+    release_soundfont() is called, even while no Synth uses it.
+    Every synth of this process loading the same file name then
+    shares the preloaded samples instead of reading its own copy, and
+    processes forked afterwards share the pages with the parent
+    (copy-on-write, nothing is written to them).  Use the same
+    spelling of the file name everywhere, it is the cache key.
+
+    For forked workers to keep sharing, their synths must not lock
+    sample memory: create them with synth.lock-memory set to 0.
+    """
+    global _preload_synth  # noqa: PLW0603
+    filename = os.fspath(filename)
+    with _preload_lock:
+        if filename in _preloaded:
+            return
+        if _preload_synth is None:
+            # never plays a note, it only holds SoundFonts
+            _preload_synth = Synth(channels=16, **{
+                'synth.polyphony': 1, 'synth.lock-memory': 0,
+                'synth.reverb.active': 0, 'synth.chorus.active': 0})
+        sfid = _preload_synth.sfload(filename)
+        if sfid == FLUID_FAILED:
+            raise OSError(f"Couldn't load SoundFont {filename}")
+        _preloaded[filename] = sfid
+
+def release_soundfont(filename):
+    """Drop a SoundFont preloaded with preload_soundfont()"""
+    with _preload_lock:
+        sfid = _preloaded.pop(os.fspath(filename), None)
+        if sfid is not None:
+            _preload_synth.sfunload(sfid)
+
+def _batch_job(job):
+    """Return the (midifile, audiofile) of a render_batch() job"""
+    if isinstance(job, (str, os.PathLike)):
+        midifile = os.fspath(job)
+        return midifile, os.path.splitext(midifile)[0] + '.wav'
+    midifile, audiofile = job
+    return os.fspath(midifile), os.fspath(audiofile)
+
+def render_batch(jobs, soundfont, workers=None, stats=None, share_soundfonts=False, **synth_kwargs):
+    """Render many MIDI files to audio files in parallel
+
+    jobs is an iterable of MIDI file names or (midifile, audiofile)
+    pairs; a bare MIDI file name is rendered next to itself with a
+    .wav extension.  soundfont is a SoundFont file name or a list of
+    them.  Every worker process creates one Synth with synth_kwargs
+    (plus any fluid settings, as for Synth) and loads the SoundFonts
+    once, then renders job after job with a system reset in between.
+
+    Results are yielded as RenderResult tuples in completion order;
+    a job that fails is reported through its error field and does
+    not stop the batch.  Pass a RenderStats object as stats to follow
+    throughput (files and audio seconds per second) as results arrive.
+
+    Optional keyword arguments:
+    workers : number of worker processes, default is the CPU count
+    share_soundfonts : preload the SoundFonts in this process and fork
+    the workers from it, so that they all share one copy of the sample
+    data instead of loading their own; the SoundFonts stay preloaded
+    for later batches until release_soundfont() is called.  Only on
+    Linux: forking is unsafe once macOS system frameworks are loaded,
+    and Windows can't fork, so elsewhere this raises ValueError
+
+    """
+    import multiprocessing
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+    soundfonts = [soundfont] if isinstance(soundfont, (str, os.PathLike)) else list(soundfont)
+    soundfonts = [os.path.abspath(sf) for sf in soundfonts]
+    workers = workers or os.cpu_count() or 1
+    if stats is None:
+        stats = RenderStats()
+    context = None
+    if share_soundfonts:
+        if not sys.platform.startswith('linux'):
+            raise ValueError("share_soundfonts needs the fork start method, only used on Linux")
+        for sf in soundfonts:
+            preload_soundfont(sf)
+        synth_kwargs = {**synth_kwargs, 'synth.lock-memory': 0}
+        context = multiprocessing.get_context('fork')
+    jobs = iter(jobs)
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=_batch_init,
+                             initargs=(soundfonts, synth_kwargs)) as pool:
+        pending = set()
+        while True:
+            # keep a bounded number of jobs in flight so huge job lists stream
+            for job in jobs:
+                pending.add(pool.submit(_batch_render, *_batch_job(job)))
+                if len(pending) >= workers * 4:
+                    break
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                stats.add(result)
+                yield result
+
+
+class SynthPool:
+    """A pool of synths with SoundFonts loaded ahead of time
+
+    For servers that render many short requests: loading SoundFonts
+    dominates the cost of a fresh Synth, so the pool keeps synths
+    warm and hands them out with
+
+        with pool.synth() as fs:
+            fs.program_select(0, pool.sfids[0], 0, 0)
+            ...
+
+    Every synth loads the soundfonts in the same order, so the IDs in
+    pool.sfids are valid for all of them.  When a synth is returned it
+    gets a system reset and its reverb and chorus are restored to the
+    values it started with.
+
+    Optional keyword arguments:
+    size : number of synths created up front and always kept, default 1
+    max_size : most synths alive at once, default is size; acquiring
+    beyond that waits for a synth to be returned
+    idle_timeout : seconds after which unused synths above size are
+    deleted, default 300, None keeps them forever
+    added capability for passing Synth arguments and fluid settings
+    """
+    def __init__(self, soundfonts=(), size=1, max_size=None, idle_timeout=300.0, **synth_kwargs):
+        self.soundfonts = [soundfonts] if isinstance(soundfonts, (str, os.PathLike)) else list(soundfonts)
+        self.size = size
+        self.max_size = max(size, max_size or size)
+        self.idle_timeout = idle_timeout
+        self.synth_kwargs = synth_kwargs
+        self.sfids = []
+        self._idle = []  # (synth, time returned), most recently used last
+        self._count = 0
+        self._defaults = {}
+        self._closed = False
+        self._cond = threading.Condition()
+        for _ in range(size):
+            self._count += 1
+            self._idle.append((self._new_synth(), time.monotonic()))
+
+    def _new_synth(self):
+        # runs without the lock, the caller has already counted the synth
+        fs = Synth(**self.synth_kwargs)
+        sfids = []
+        for soundfont in self.soundfonts:
+            sfid = fs.sfload(os.fspath(soundfont))
+            if sfid == FLUID_FAILED:
+                fs.delete()
+                raise OSError(f"Couldn't load SoundFont {soundfont}")
+            sfids.append(sfid)
+        defaults = (
+            (fs.get_reverb_roomsize(), fs.get_reverb_damp(), fs.get_reverb_width(), fs.get_reverb_level()),
+            (fs.get_chorus_nr(), fs.get_chorus_level(), fs.get_chorus_speed(), fs.get_chorus_depth(),
+             fs.get_chorus_type()),
+        )
+        with self._cond:
+            self.sfids = sfids
+            self._defaults[id(fs)] = defaults
+        return fs
+
+    def _delete_synth(self, fs):
+        del self._defaults[id(fs)]
+        self._count -= 1
+        fs.delete()
+
+    def _evict_idle(self):
+        if self.idle_timeout is None:
+            return
+        deadline = time.monotonic() - self.idle_timeout
+        # least recently used synths come first
+        while self._count > self.size and self._idle and self._idle[0][1] <= deadline:
+            fs, _ = self._idle.pop(0)
+            self._delete_synth(fs)
+
+    @property
+    def count(self):
+        """Number of synths alive, idle or in use"""
+        return self._count
+
+    def acquire(self, timeout=None):
+        """Take a synth out of the pool, waiting up to timeout seconds"""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("SynthPool is closed")
+            self._evict_idle()
+            if not self._cond.wait_for(lambda: self._idle or self._count < self.max_size or self._closed, timeout):
+                raise TimeoutError(f"No synth available within {timeout} seconds")
+            if self._closed:
+                raise RuntimeError("SynthPool is closed")
+            if self._idle:
+                return self._idle.pop()[0]
+            # reserve the slot, loading SoundFonts mustn't hold up other callers
+            self._count += 1
+        try:
+            fs = self._new_synth()
+        except BaseException:
+            with self._cond:
+                self._count -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            if self._closed:
+                self._delete_synth(fs)
+                raise RuntimeError("SynthPool is closed")
+        return fs
+
+    def release(self, fs):
+        """Reset a synth and return it to the pool"""
+        reverb, chorus = self._defaults[id(fs)]
+        fs.system_reset()
+        fs.set_reverb(*reverb)
+        fs.set_chorus(*chorus)
+        with self._cond:
+            if self._closed:
+                self._delete_synth(fs)
+                return
+            self._idle.append((fs, time.monotonic()))
+            self._evict_idle()
+            self._cond.notify()
+
+    @contextmanager
+    def synth(self, timeout=None):
+        """Context manager lending a synth from the pool"""
+        fs = self.acquire(timeout)
+        try:
+            yield fs
+        finally:
+            self.release(fs)
+
+    def close(self):
+        """Delete idle synths; synths still in use are deleted when returned"""
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                self._delete_synth(self._idle.pop()[0])
+            self._cond.notify_all()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class AsyncSynth:
+    """asyncio front end for a Synth
+
+    Every Synth method is available as a coroutine of the same name,
+    e.g. await asynth.noteon(0, 60, 100).  The calls run one after the
+    other on a worker thread dedicated to this synth, so the event
+    loop never waits for libfluidsynth and many synths can render
+    concurrently.  Attributes that aren't methods are read directly.
+
+    Pass an existing Synth, or keyword arguments to create one that
+    is deleted by close().  Use as an async context manager.
+    """
+    def __init__(self, synth=None, **kwargs):
+        from concurrent.futures import ThreadPoolExecutor
+        self._owns_synth = synth is None
+        self.synth = Synth(**kwargs) if synth is None else synth
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='fluidsynth')
+
+    async def call(self, func, *args, **kwargs):
+        """Run func(*args, **kwargs) on the synth's worker thread"""
+        import asyncio
+        from functools import partial
+        return await asyncio.get_running_loop().run_in_executor(self._executor, partial(func, *args, **kwargs))
+
+    def __getattr__(self, name):
+        attr = getattr(self.synth, name)
+        if not callable(attr):
+            return attr
+        async def method(*args, **kwargs):
+            return await self.call(attr, *args, **kwargs)
+        method.__name__ = name
+        method.__doc__ = attr.__doc__
+        return method
+
+    async def blocks(self, len=1024, dtype=None):
+        """Yield blocks of get_samples() forever, rendered on the worker thread"""
+        while True:
+            yield await self.call(self.synth.get_samples, len, dtype)
+
+    async def render_midi(self, midifile, chunk_frames=65536, dtype=None):
+        """Yield the blocks of Synth.render_midi() as they are rendered"""
+        blocks = await self.call(self.synth.render_midi, midifile, chunk_frames, dtype)
+        try:
+            while (block := await self.call(next, blocks, None)) is not None:
+                yield block
+        finally:
+            await self.call(blocks.close)
+
+    async def player_join(self, interval=0.05):
+        """Wait for the MIDI file started with play_midi_file() to finish
+
+        Unlike fluid_player_join(), this polls the player status, so
+        neither the loop nor the worker thread is blocked meanwhile.
+        """
+        import asyncio
+        while fluid_player_get_status(self.synth.player) == FLUID_PLAYER_PLAYING:  # noqa: ASYNC110
+            await asyncio.sleep(interval)
+
+    async def close(self):
+        """Stop the worker thread, deleting the synth if this object created it"""
+        if self._owns_synth:
+            await self.call(self.synth.delete)
+        self._executor.shutdown(wait=False)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+class AsyncSequencer:
+    """asyncio front end for a Sequencer
+
+    Scheduling never blocks, so Sequencer methods are called directly
+    (asequencer.note(...)).  Client callbacks registered here run on
+    the event loop instead of libfluidsynth's thread.
+
+    Pass an existing Sequencer, or keyword arguments to create one.
+    """
+    def __init__(self, sequencer=None, **kwargs):
+        self.sequencer = Sequencer(**kwargs) if sequencer is None else sequencer
+        self._ready = None
+
+    def __getattr__(self, name):
+        return getattr(self.sequencer, name)
+
+    def register_client(self, name, callback, loop=None):
+        """Register a sequencer client whose callback runs on the event loop
+
+        callback is called with a SequencerEvent; the event is copied
+        in libfluidsynth's thread and handed over with
+        call_soon_threadsafe().  loop defaults to the running loop.
+        """
+        if loop is None:
+            import asyncio
+            loop = asyncio.get_running_loop()
+        def deliver(time, event, seq, data):
+            loop.call_soon_threadsafe(callback, _copy_sequencer_event(time, event))
+        return self.sequencer.register_client(name, deliver)
+
+    def register_queue_client(self, name, maxlen=None, loop=None, notes=False):
+        """Register a queue client whose events are read with events()
+
+        See Sequencer.register_queue_client().  The loop is only woken
+        when events arrive in an empty queue, not once per event.
+        loop defaults to the running loop.
+        """
+        import asyncio
+        if loop is None:
+            loop = asyncio.get_running_loop()
+        if self._ready is None:
+            self._ready = asyncio.Event()
+        ready = self._ready
+        return self.sequencer.register_queue_client(name, maxlen, lambda: loop.call_soon_threadsafe(ready.set), notes)
+
+    async def events(self, batch_size=64):
+        """Yield lists of up to batch_size queued client events as they arrive"""
+        if self._ready is None:
+            raise RuntimeError("No queue client registered")
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+            while batch := self.sequencer.poll_events(batch_size):
+                yield batch
+
+
+# Tracing of C calls, see enable_tracing()
+
+# Environment variable enabling tracing at import: 1 prints a table
+# to stderr at exit, anything else is a file name for a Chrome trace
+TRACE_ENV = 'PYFLUIDSYNTH_TRACE'
+
+class TraceStat(NamedTuple):
+    """Totals of one C function while traced, see tracing_stats()"""
+    calls: int
+    seconds: float
+    conversion_seconds: float
+
+_traced = {}          # name -> original module attribute replaced by a _TracedFunction
+_trace_totals = {}    # name -> [calls, seconds, conversion seconds]
+_trace_events = []    # (name, start, duration, thread id) for the Chrome trace
+_trace_max_events = 0
+_trace_origin = 0.0
+
+class _TracedFunction:
+    """Stands in for a C function while tracing is enabled"""
+    __slots__ = ('converters', 'func', 'name', 'totals')
+
+    def __init__(self, name, func):
+        self.name = name
+        self.func = func
+        self.converters = [argtype.from_param for argtype in func.argtypes or ()]
+        self.totals = _trace_totals.setdefault(name, [0, 0.0, 0.0])
+
+    def __call__(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            for convert, arg in zip(self.converters, args, strict=False):
+                convert(arg)
+        except Exception:  # noqa: BLE001, S110
+            pass  # the real call raises it
+        converted = time.perf_counter()
+        try:
+            return self.func(*args, **kwargs)
+        finally:
+            end = time.perf_counter()
+            totals = self.totals
+            totals[0] += 1
+            totals[1] += end - start
+            totals[2] += converted - start
+            if len(_trace_events) < _trace_max_events:
+                _trace_events.append((self.name, start, end - start, threading.get_ident()))
+
+    @property
+    def _as_parameter_(self):
+        return self.func
+
+    def __repr__(self):
+        return f'<traced {self.name}>'
+
+def _reset_bare_funcs():
+    global _event_funcs, _seq_event_funcs, _event_getters  # noqa: PLW0603
+    _event_funcs = _seq_event_funcs = _event_getters = None
+
+def enable_tracing(max_events=100000):
+    """Time every call into libfluidsynth made by this module
+
+    Each bound C function is replaced by a wrapper counting calls,
+    their total time and the part of it spent converting Python
+    arguments to C (measured by converting them once more before the
+    call, so the C time is the difference).  The first max_events
+    calls are also kept for write_chrome_trace().  Tracing slows every
+    call down; see tracing_table() for the results.
+
+    Setting PYFLUIDSYNTH_TRACE enables tracing at import.
+    """
+    global _trace_max_events, _trace_origin  # noqa: PLW0603
+    _trace_max_events = max_events
+    if _traced:
+        return
+    _trace_origin = time.perf_counter()
+    namespace = globals()
+    for binding in _bindings:
+        current = namespace.get(binding.name)
+        if current is binding or current is binding.func:
+            _traced[binding.name] = current
+            namespace[binding.name] = _TracedFunction(binding.name, binding.resolve())
+    _reset_bare_funcs()
+
+def disable_tracing():
+    """Restore the plain C functions, keeping the results gathered so far"""
+    namespace = globals()
+    for name, original in _traced.items():
+        namespace[name] = original
+    _traced.clear()
+    _reset_bare_funcs()
+
+def reset_tracing():
+    """Forget the results gathered so far"""
+    for totals in _trace_totals.values():
+        totals[:] = [0, 0.0, 0.0]
+    _trace_events.clear()
+
+def tracing_stats():
+    """Return {function name: TraceStat} for every C function called while traced"""
+    return {name: TraceStat(*totals) for name, totals in _trace_totals.items() if totals[0]}
+
+def tracing_table(sort='seconds', limit=None):
+    """Return the tracing results as a text table, slowest functions first
+
+    sort is a TraceStat field name.
+    """
+    stats = sorted(tracing_stats().items(), key=lambda item: getattr(item[1], sort), reverse=True)[:limit]
+    width = max([len('function'), *(len(name) for name, _ in stats)])
+    lines = [f'{"function":<{width}} {"calls":>10} {"total ms":>12} {"convert ms":>12} {"us/call":>10}']
+    for name, stat in stats:
+        lines.append(f'{name:<{width}} {stat.calls:>10} {stat.seconds * 1e3:>12.3f} '
+                     f'{stat.conversion_seconds * 1e3:>12.3f} {stat.seconds / stat.calls * 1e6:>10.2f}')
+    return '\n'.join(lines)
+
+def write_chrome_trace(file):
+    """Write the traced calls as Chrome trace JSON (chrome://tracing, Perfetto)
+
+    file is a file name or a text file object.
+    """
+    pid = os.getpid()
+    trace = {'displayTimeUnit': 'ms', 'traceEvents': [
+        {'name': name, 'cat': 'fluidsynth', 'ph': 'X', 'pid': pid, 'tid': tid,
+         'ts': (start - _trace_origin) * 1e6, 'dur': duration * 1e6}
+        for name, start, duration, tid in _trace_events]}
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, 'w') as f:
+            json.dump(trace, f)
+    else:
+        json.dump(trace, file)
+
+def _report_tracing(target):
+    if target == '1':
+        import sys
+        print(tracing_table(), file=sys.stderr)
+    else:
+        write_chrome_trace(target.replace('{pid}', str(os.getpid())))
+
+if os.getenv(TRACE_ENV):
+    import atexit
+    enable_tracing()
+    atexit.register(_report_tracing, os.environ[TRACE_ENV])
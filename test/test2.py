@@ -30,12 +30,14 @@ strm = pa.open(
     rate = 44100,
     output = True)
 
-s = []
+# Collect blocks in a list and join them once at the end; appending to
+# a NumPy array copies the whole array every time.
+blocks = []
 
 fs = fluidsynth.Synth()
 
 # Initial silence is 1 second
-s = numpy.append(s, fs.get_samples(44100 * 1))
+blocks.append(fs.get_samples(44100 * 1))
 
 sfid = fs.sfload(local_file_path("example.sf2"))
 fs.program_select(0, sfid, 0, 0)
@@ -45,17 +47,18 @@ fs.noteon(0, 67, 30)
 fs.noteon(0, 76, 30)
 
 # Chord is held for 2 seconds
-s = numpy.append(s, fs.get_samples(44100 * 2))
+blocks.append(fs.get_samples(44100 * 2))
 
 fs.noteoff(0, 60)
 fs.noteoff(0, 67)
 fs.noteoff(0, 76)
 
 # Decay of chord is held for 1 second
-s = numpy.append(s, fs.get_samples(44100 * 1))
+blocks.append(fs.get_samples(44100 * 1))
 
 fs.delete()
 
+s = numpy.concatenate(blocks)
 samps = fluidsynth.raw_audio_string(s)
 
 print(len(samps))
@@ -0,0 +1,24 @@
+"""Record the reference render digest of the installed libfluidsynth
+
+Run from the repository root, then commit test/render_digests.json:
+
+    python -m tests.record_render_digests
+"""
+
+import json
+from pathlib import Path
+
+from tests.test_pyfluidsynth import _reference_digest_key, _reference_render_digest
+
+
+def main() -> None:
+    path = Path(__file__).resolve().parent.parent / "test" / "render_digests.json"
+    digests = json.loads(path.read_text())
+    key = _reference_digest_key()
+    digests[key] = _reference_render_digest()
+    path.write_text(json.dumps(digests, indent=2, sort_keys=True) + "\n")
+    print(f"{key}: {digests[key]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,11 @@
+import asyncio
+import hashlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
 from pathlib import Path
 
 import numpy as np
@@ -237,3 +245,850 @@ def test_modulator_smoke() -> None:
     mod = fluidsynth.Modulator()
     # Just ensure calls don't raise; return values are backend-specific
     assert mod.sizeof() is not None
+
+
+def test_get_samples_into_numpy_and_bytearray() -> None:
+    synth = fluidsynth.Synth()
+    try:
+        out = np.full(64 * 2, 1234, dtype=np.int16)
+        assert synth.get_samples_into(out) == 64
+        np.testing.assert_array_equal(out, 0)  # silence, written in place
+
+        raw = bytearray(64 * 4)
+        assert synth.get_samples_into(raw) == 64
+        assert synth.get_samples_into(memoryview(raw)) == 64
+    finally:
+        synth.delete()
+
+
+def test_get_samples_into_offset_and_stride() -> None:
+    synth = fluidsynth.Synth()
+    try:
+        # four-channel frames, synth writes into channels 2 and 3
+        out = np.full(32 * 4, 99, dtype=np.int16)
+        assert synth.get_samples_into(out, offset=2, stride=4) == 32
+        frames = out.reshape(32, 4)
+        np.testing.assert_array_equal(frames[:, :2], 99)
+        np.testing.assert_array_equal(frames[:, 2:], 0)
+    finally:
+        synth.delete()
+
+
+def test_get_samples_into_rejects_bad_buffers() -> None:
+    synth = fluidsynth.Synth()
+    try:
+        with pytest.raises(TypeError):
+            synth.get_samples_into(bytes(256))
+        with pytest.raises(TypeError):
+            synth.get_samples_into(np.zeros(128, dtype=np.float64))
+        with pytest.raises(ValueError, match="too small"):
+            synth.get_samples_into(np.zeros(128, dtype=np.int16), len=65)
+        with pytest.raises(ValueError, match="contiguous"):
+            synth.get_samples_into(np.zeros((128, 2), dtype=np.int16)[:, 0])
+    finally:
+        synth.delete()
+
+
+@pytest.mark.parametrize("dtype", [np.int16, np.float32])
+def test_get_samples_dtype_and_layout(dtype) -> None:
+    synth = fluidsynth.Synth()
+    try:
+        n = 64
+        interleaved = synth.get_samples(n, dtype=dtype)
+        assert interleaved.dtype == dtype
+        assert interleaved.shape == (n * 2,)
+        planar = synth.get_samples(n, dtype=dtype, layout="planar")
+        assert planar.dtype == dtype
+        assert planar.shape == (2, n)
+        with pytest.raises(ValueError, match="layout"):
+            synth.get_samples(n, layout="surround")
+        with pytest.raises(TypeError):
+            synth.get_samples(n, dtype=np.float64)
+    finally:
+        synth.delete()
+
+
+def test_get_samples_into_float32() -> None:
+    synth = fluidsynth.Synth()
+    try:
+        out = np.ones(64 * 2, dtype=np.float32)
+        assert synth.get_samples_into(out) == 64
+        np.testing.assert_array_equal(out, 0.0)
+    finally:
+        synth.delete()
+
+
+def test_get_group_samples_separates_stems() -> None:
+    sf2 = _asset_path("example.sf2")
+    settings = {"synth.reverb.active": 0, "synth.chorus.active": 0}
+    synth = fluidsynth.Synth(audio_groups=2, channels=16, **settings)
+    try:
+        sfid = synth.sfload(str(sf2))
+        synth.program_select(1, sfid, 0, 0)
+        synth.noteon(1, 60, 100)
+
+        out = np.empty((2, 2, 512), dtype=np.float32)
+        assert synth.get_group_samples(512, out=out) is out
+        # MIDI channel 1 plays into audio group 1 only
+        assert np.abs(out[1]).max() > 0
+        np.testing.assert_array_equal(out[0], 0.0)
+
+        with pytest.raises(ValueError, match="shape"):
+            synth.get_group_samples(256, out=out)
+    finally:
+        synth.delete()
+
+
+def test_render_batch_streams_results_and_errors(tmp_path) -> None:
+    sf2 = _asset_path("example.sf2")
+    mid = _asset_path("1080-c01.mid")
+    jobs = [
+        (mid, tmp_path / "a.wav"),
+        (mid, tmp_path / "b.wav"),
+        (tmp_path / "missing.mid", tmp_path / "c.wav"),
+    ]
+    stats = fluidsynth.RenderStats()
+    results = list(fluidsynth.render_batch(jobs, str(sf2), workers=2, stats=stats))
+
+    assert len(results) == 3
+    by_name = {Path(r.audiofile).name: r for r in results}
+    for name in ("a.wav", "b.wav"):
+        assert by_name[name].error is None
+        assert by_name[name].audio_seconds > 0
+        assert (tmp_path / name).stat().st_size > 0
+    assert by_name["c.wav"].error is not None
+    assert stats.files == 3
+    assert stats.failed == 1
+    assert stats.files_per_second > 0
+    assert stats.audio_seconds_per_second > 0
+
+
+def test_render_midi_yields_chunks() -> None:
+    sf2 = _asset_path("example.sf2")
+    mid = _asset_path("1080-c01.mid")
+    synth = fluidsynth.Synth()
+    try:
+        synth.sfload(str(sf2))
+        blocks = list(synth.render_midi(str(mid), chunk_frames=44100, dtype=np.float32))
+        assert len(blocks) > 1
+        assert all(b.shape == (44100 * 2,) and b.dtype == np.float32 for b in blocks)
+        assert max(np.abs(b).max() for b in blocks) > 0
+
+        with pytest.raises(OSError, match="MIDI"):
+            next(synth.render_midi("does-not-exist.mid"))
+    finally:
+        synth.delete()
+
+
+def test_wav_sink_streams_blocks(tmp_path) -> None:
+    import wave
+
+    synth = fluidsynth.Synth()
+    try:
+        path = tmp_path / "out.wav"
+        with fluidsynth.WavSink(path, samplerate=44100) as sink:
+            for _ in range(4):
+                synth.get_samples(256, sink=sink)
+        assert sink.frames == 1024
+        with wave.open(str(path)) as w:
+            assert w.getnchannels() == 2
+            assert w.getsampwidth() == 2
+            assert w.getframerate() == 44100
+            assert w.getnframes() == 1024
+    finally:
+        synth.delete()
+
+
+def test_raw_sink_rejects_mismatched_dtype(tmp_path) -> None:
+    with fluidsynth.RawSink(tmp_path / "out.raw", dtype=np.float32) as sink:
+        sink.write(np.zeros(8, dtype=np.float32))
+        with pytest.raises(TypeError):
+            sink.write(np.zeros(8, dtype=np.int16))
+    assert (tmp_path / "out.raw").stat().st_size == 32
+
+
+def test_render_midi_into_sink(tmp_path) -> None:
+    sf2 = _asset_path("example.sf2")
+    mid = _asset_path("1080-c01.mid")
+    synth = fluidsynth.Synth()
+    try:
+        synth.sfload(str(sf2))
+        with fluidsynth.WavSink(tmp_path / "song.wav") as sink:
+            frames = synth.render_midi(str(mid), chunk_frames=8192, sink=sink)
+        assert frames > 0
+        assert frames % 8192 == 0
+        assert sink.frames == frames
+    finally:
+        synth.delete()
+
+
+def test_send_events_batch() -> None:
+    sf2 = _asset_path("example.sf2")
+    synth = fluidsynth.Synth()
+    try:
+        sfid = synth.sfload(str(sf2))
+        synth.program_select(0, sfid, 0, 0)
+        events = np.zeros(4, dtype=fluidsynth.EVENT_DTYPE)
+        events["type"] = [fluidsynth.CONTROL_CHANGE, fluidsynth.NOTE_ON, fluidsynth.NOTE_ON, fluidsynth.PITCH_BEND]
+        events["data1"] = [7, 60, 64, 8192]
+        events["data2"] = [90, 100, 100, 0]
+        assert synth.send_events(events) == 4
+        assert synth.get_cc(0, 7) == 90
+        assert synth.get_active_voice_count() == 4
+
+        rows = np.array([[fluidsynth.NOTE_OFF, 0, 60, 0], [fluidsynth.NOTE_OFF, 0, 64, 0]])
+        assert synth.send_events(rows) == 2
+        assert synth.send_events(np.zeros(0, dtype=fluidsynth.EVENT_DTYPE)) == 0
+    finally:
+        synth.delete()
+
+
+def test_send_events_validates_whole_batch_first() -> None:
+    synth = fluidsynth.Synth()
+    try:
+        events = np.array([[fluidsynth.CONTROL_CHANGE, 0, 7, 90], [fluidsynth.NOTE_ON, 0, 60, 128]])
+        with pytest.raises(ValueError, match="index 1"):
+            synth.send_events(events)
+        # nothing was sent, not even the valid first event
+        assert synth.get_cc(0, 7) != 90
+        with pytest.raises(ValueError, match="index 0"):
+            synth.send_events(np.array([[0x42, 0, 0, 0]]))
+    finally:
+        synth.delete()
+
+
+def test_render_events_matches_manual_block_rendering() -> None:
+    sf2 = _asset_path("example.sf2")
+    events = np.zeros(3, dtype=fluidsynth.TIMED_EVENT_DTYPE)
+    events["frame"] = [640, 640, 2048]
+    events["type"] = [fluidsynth.NOTE_ON, fluidsynth.NOTE_ON, fluidsynth.NOTE_OFF]
+    events["data1"] = [60, 67, 60]
+    events["data2"] = [100, 100, 0]
+
+    rendered = []
+    for manual in (False, True):
+        synth = fluidsynth.Synth()
+        try:
+            sfid = synth.sfload(str(sf2))
+            synth.program_select(0, sfid, 0, 0)
+            if manual:
+                blocks = [synth.get_samples(640, dtype=np.float32)]
+                synth.noteon(0, 60, 100)
+                synth.noteon(0, 67, 100)
+                blocks.append(synth.get_samples(2048 - 640, dtype=np.float32))
+                synth.noteoff(0, 60)
+                blocks.append(synth.get_samples(4096 - 2048, dtype=np.float32))
+                rendered.append(np.concatenate(blocks))
+            else:
+                rendered.append(synth.render_events(events, 4096, dtype=np.float32))
+        finally:
+            synth.delete()
+
+    out, expected = rendered
+    assert out.shape == (4096 * 2,)
+    np.testing.assert_array_equal(out[: 640 * 2], 0.0)
+    assert np.abs(out[640 * 2 :]).max() > 0
+    np.testing.assert_array_equal(out, expected)
+
+
+def test_render_events_time_field_and_validation() -> None:
+    synth = fluidsynth.Synth()
+    try:
+        dtype = [("time_s", "f8"), *fluidsynth.EVENT_DTYPE]
+        events = np.zeros(2, dtype=dtype)
+        events["time_s"] = [0.5, 0.1]
+        events["type"] = fluidsynth.NOTE_OFF
+        with pytest.raises(ValueError, match="sorted"):
+            synth.render_events(events, 44100)
+        events["time_s"] = [0.1, 0.5]
+        out = np.empty(44100 * 2, dtype=np.int16)
+        assert synth.render_events(events, 44100, out=out) is out
+        with pytest.raises(ValueError, match="too small"):
+            synth.render_events(events, 44101, out=out)
+    finally:
+        synth.delete()
+
+
+@pytest.mark.skipif(
+    getattr(fluidsynth, "new_fluid_sequencer2", None) is None,
+    reason="Sequencer API not available in this libfluidsynth",
+)
+def test_sequencer_schedule_many() -> None:
+    sf2 = _asset_path("example.sf2")
+    synth = fluidsynth.Synth(channels=16)
+    seq = fluidsynth.Sequencer(use_system_timer=False)
+    try:
+        sfid = synth.sfload(str(sf2))
+        synth.program_select(0, sfid, 0, 0)
+        synth_id = seq.register_fluidsynth(synth)
+
+        events = np.zeros(3, dtype=fluidsynth.SEQUENCER_EVENT_DTYPE)
+        events["time"] = [0, 0, 0]
+        events["type"] = [fluidsynth.CONTROL_CHANGE, fluidsynth.NOTE_ON, fluidsynth.NOTE_ON]
+        events["data1"] = [7, 60, 64]
+        events["data2"] = [90, 100, 100]
+        events["duration"] = [0, 0, 500]
+        assert seq.schedule_many(events, dest=synth_id, absolute=False) == 3
+        seq.process(seq.get_tick() + 10)
+        assert synth.get_cc(0, 7) == 90
+        assert synth.get_active_voice_count() == 4
+
+        events["data2"][1] = 200
+        with pytest.raises(ValueError, match="index 1"):
+            seq.schedule_many(events, dest=synth_id)
+        events["data2"][1] = 100
+        events["chan"][2] = 16
+        with pytest.raises(ValueError, match="index 2"):
+            seq.schedule_many(events, dest=synth_id)
+        with pytest.raises(ValueError, match="structured array"):
+            seq.schedule_many(np.zeros((3, 4), dtype=int), dest=synth_id)
+        # the reused event still works for single notes
+        seq.note_on(seq.get_tick(), 0, 67, 100, dest=synth_id)
+    finally:
+        seq.delete()
+        synth.delete()
+
+
+def test_cfunc_builds_prototype_on_first_call() -> None:
+    from ctypes import POINTER, c_int, c_void_p
+
+    binding = fluidsynth.cfunc(
+        "fluid_version", c_void_p,
+        ("major", POINTER(c_int), 1), ("minor", POINTER(c_int), 1), ("micro", POINTER(c_int), 1),
+    )
+    assert binding is not None
+    assert binding.func is None
+    major = c_int()
+    binding(major, c_int(), c_int())
+    assert major.value >= 1
+    assert binding.func is not None
+
+
+def test_find_libfluidsynth_honours_pinned_library(monkeypatch) -> None:
+    monkeypatch.setenv(fluidsynth.LIBRARY_ENV, "/opt/custom/libfluidsynth.so.3")
+    assert fluidsynth.find_libfluidsynth(False) == "/opt/custom/libfluidsynth.so.3"
+
+
+def test_synth_pool_reuses_and_resets_synths() -> None:
+    sf2 = _asset_path("example.sf2")
+    with fluidsynth.SynthPool([str(sf2)], size=1, max_size=2) as pool:
+        assert len(pool.sfids) == 1
+        with pool.synth() as fs:
+            first = fs
+            fs.program_select(0, pool.sfids[0], 0, 0)
+            default_room = fs.get_reverb_roomsize()
+            fs.set_reverb_roomsize(0.99)
+            fs.noteon(0, 60, 100)
+            assert fs.get_active_voice_count() > 0
+            # a second synth is created on demand, a third has to wait
+            with pool.synth() as other:
+                assert other is not fs
+                with pytest.raises(TimeoutError):
+                    pool.acquire(timeout=0.01)
+        with pool.synth() as fs:
+            assert fs is first
+            assert fs.get_active_voice_count() == 0
+            assert fs.get_reverb_roomsize() == pytest.approx(default_room)
+    with pytest.raises(RuntimeError):
+        pool.acquire()
+
+
+def test_synth_pool_evicts_idle_synths() -> None:
+    pool = fluidsynth.SynthPool(size=1, max_size=3, idle_timeout=0.0)
+    try:
+        a = pool.acquire()
+        b = pool.acquire()
+        assert pool.count == 2
+        pool.release(a)
+        pool.release(b)
+        # everything above size is evicted once idle
+        assert pool.count == 1
+    finally:
+        pool.close()
+
+
+def test_preload_and_release_soundfont() -> None:
+    sf2 = str(_asset_path("example.sf2"))
+    fluidsynth.preload_soundfont(sf2)
+    fluidsynth.preload_soundfont(sf2)  # already preloaded, no-op
+    synth = fluidsynth.Synth()
+    try:
+        assert synth.sfload(sf2) >= 0
+    finally:
+        synth.delete()
+        fluidsynth.release_soundfont(sf2)
+    fluidsynth.release_soundfont(sf2)  # not preloaded any more, no-op
+    with pytest.raises(OSError, match="SoundFont"):
+        fluidsynth.preload_soundfont("does-not-exist.sf2")
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="shared SoundFonts are Linux only")
+def test_render_batch_with_shared_soundfonts(tmp_path) -> None:
+    sf2 = _asset_path("example.sf2")
+    mid = _asset_path("1080-c01.mid")
+    try:
+        results = list(fluidsynth.render_batch(
+            [(mid, tmp_path / "a.wav")], str(sf2), workers=1, share_soundfonts=True,
+        ))
+        assert [r.error for r in results] == [None]
+    finally:
+        fluidsynth.release_soundfont(os.path.abspath(sf2))
+
+
+def test_sfload_bytes_and_fileobj() -> None:
+    sf2 = _asset_path("example.sf2")
+    data = sf2.read_bytes()
+    synth = fluidsynth.Synth()
+    try:
+        sfid = synth.sfload_bytes(data)
+        assert sfid >= 0
+        assert synth.sfpreset_name(sfid, 0, 0) is not None
+        buf = bytearray(data)
+        assert synth.sfload_bytes(buf, cacheable=True) >= 0
+        buf.extend(b"\0")  # the synth doesn't hold on to the buffer
+        with sf2.open("rb") as f:
+            assert synth.sfload_fileobj(f) >= 0
+        assert synth.sfload(str(sf2)) >= 0  # files load through the same loader
+        assert synth.sfload_bytes(b"not a SoundFont") == fluidsynth.FLUID_FAILED
+        assert synth.sfunload(sfid) == fluidsynth.FLUID_OK
+    finally:
+        synth.delete()
+    assert not fluidsynth._memory_soundfonts  # noqa: SLF001
+
+
+def test_sfload_bytes_after_sfload_raises() -> None:
+    sf2 = _asset_path("example.sf2")
+    synth = fluidsynth.Synth()
+    try:
+        synth.sfload(str(sf2))
+        with pytest.raises(RuntimeError, match="before"):
+            synth.sfload_bytes(sf2.read_bytes())
+    finally:
+        synth.delete()
+
+
+def test_sfont_presets_index_and_invalidation() -> None:
+    sf2 = _asset_path("example.sf2")
+    synth = fluidsynth.Synth()
+    try:
+        sfid = synth.sfload(str(sf2))
+        presets = synth.sfont_presets(sfid)
+        assert presets
+        (bank, prog), name = next(iter(presets.items()))
+        assert synth.sfpreset_name(sfid, bank, prog) == name
+        assert synth.sfpreset_name(sfid, 129, 0) is None
+        synth.sfunload(sfid)
+        with pytest.raises(ValueError, match="No SoundFont"):
+            synth.sfont_presets(sfid)
+        assert synth.sfpreset_name(sfid, bank, prog) is None
+    finally:
+        synth.delete()
+
+
+def test_sfont_presets_disk_cache(tmp_path, monkeypatch) -> None:
+    sf2 = _asset_path("example.sf2")
+    synth = fluidsynth.Synth()
+    try:
+        expected = dict(synth.sfont_presets(synth.sfload(str(sf2)), cache_dir=tmp_path))
+    finally:
+        synth.delete()
+    assert len(list(tmp_path.glob("*.json"))) == 1
+
+    def no_walk(self, sfid):
+        raise AssertionError("SoundFont walked despite cached index")
+
+    monkeypatch.setattr(fluidsynth.Synth, "_walk_presets", no_walk)
+    synth = fluidsynth.Synth()
+    try:
+        assert dict(synth.sfont_presets(synth.sfload(str(sf2)), cache_dir=tmp_path)) == expected
+    finally:
+        synth.delete()
+
+
+def test_async_synth_offloads_calls_and_streams_blocks() -> None:
+    sf2 = _asset_path("example.sf2")
+    mid = _asset_path("1080-c01.mid")
+
+    async def main():
+        async with fluidsynth.AsyncSynth(gain=0.5) as asynth:
+            assert asynth.settings is asynth.synth.settings
+            assert await asynth.sfload(str(sf2)) >= 0
+            await asynth.noteon(0, 60, 100)
+            block = await anext(asynth.blocks(256))
+            assert block.shape == (512,)
+            chunks = [chunk async for chunk in asynth.render_midi(str(mid), chunk_frames=44100)]
+            assert chunks
+            assert all(chunk.shape == (88200,) for chunk in chunks)
+
+    asyncio.run(main())
+
+
+def test_async_sequencer_delivers_client_events_on_loop() -> None:
+    async def main():
+        received = []
+        aseq = fluidsynth.AsyncSequencer(use_system_timer=False)
+        try:
+            client = aseq.register_client("async", received.append)
+            now = aseq.get_tick()
+            aseq.timer(now + 5, data=42, dest=client)
+            aseq.process(now + 10)
+            await asyncio.sleep(0)
+            assert [(e.type, e.data) for e in received] == [(fluidsynth.FLUID_SEQ_TIMER, 42)]
+        finally:
+            aseq.delete()
+
+    asyncio.run(main())
+
+
+def test_render_thread_fills_ring_and_reads() -> None:
+    synth = fluidsynth.Synth()
+    try:
+        rt = synth.start_render_thread(frames_per_block=64, ring_capacity=4)
+        with pytest.raises(RuntimeError, match="already running"):
+            synth.start_render_thread()
+        # the thread renders until the ring is full, then waits for reads
+        deadline = time.monotonic() + 30
+        while rt.available < 256 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        # stopped, nothing refills the ring behind the reads below
+        rt.stop()
+        assert rt.available == 256
+        out = np.empty(100 * 2, dtype=np.int16)
+        assert rt.read_into(out) == 100
+        assert rt.underruns == 0
+        assert rt.read(10000).shape == (20000,)
+        assert rt.underruns == 1
+        assert rt.underrun_frames == 10000 - 156
+        with pytest.raises(TypeError):
+            rt.read_into(np.empty(10, dtype=np.float32))
+    finally:
+        synth.delete()
+    assert not rt.is_alive()
+
+
+def test_sequencer_queue_client_polls_in_batches() -> None:
+    seq = fluidsynth.Sequencer(use_system_timer=False)
+    try:
+        client = seq.register_queue_client("queue")
+        now = seq.get_tick()
+        for i in range(5):
+            seq.timer(now + i, data=i, dest=client)
+        seq.process(now + 10)
+        batch = seq.poll_events(3)
+        assert [e.data or 0 for e in batch] == [0, 1, 2]  # NULL data comes back as None
+        assert all(e.type == fluidsynth.FLUID_SEQ_TIMER and e.dest == client for e in batch)
+        assert [e.data for e in seq.poll_events()] == [3, 4]
+        assert seq.poll_events() == []
+        notes = seq.register_queue_client("notes", notes=True)
+        seq.note_on(now + 11, 3, 64, 90, dest=notes)
+        seq.process(now + 20)
+        (event,) = seq.poll_events()
+        assert (event.channel, event.key, event.velocity) == (3, 64, 90)
+        assert event.source is None
+        with pytest.raises(ValueError, match="maxlen"):
+            seq.register_queue_client("bounded", maxlen=10)
+    finally:
+        seq.delete()
+
+
+def test_async_sequencer_queue_client_events() -> None:
+    async def main():
+        aseq = fluidsynth.AsyncSequencer(use_system_timer=False)
+        try:
+            client = aseq.register_queue_client("queue")
+            now = aseq.get_tick()
+            for i in range(1, 4):
+                aseq.timer(now + i, data=i, dest=client)
+            aseq.process(now + 10)
+            batches = aseq.events(batch_size=2)
+            assert [e.data for e in await anext(batches)] == [1, 2]
+            assert [e.data for e in await anext(batches)] == [3]
+        finally:
+            aseq.delete()
+
+    asyncio.run(main())
+
+
+def test_synth_stats_and_openmetrics() -> None:
+    sf2 = _asset_path("example.sf2")
+    synth = fluidsynth.Synth()
+    try:
+        synth.program_select(0, synth.sfload(str(sf2)), 0, 0)
+        synth.noteon(0, 60, 100)
+        synth.cc(0, 7, 100)
+        for _ in range(4):
+            synth.get_samples(512)
+        stats = synth.stats()
+        assert stats.active_voices > 0
+        assert stats.polyphony == synth.get_setting("synth.polyphony")
+        assert stats.events == 2
+        assert stats.events_per_second > 0
+        assert stats.render_blocks == 4
+        assert stats.render_frames == 2048
+        assert stats.render_time_buckets[-1] == (float("inf"), 4)
+        assert (stats.underruns, stats.overruns) == (0, 0)
+        assert synth.stats().events_per_second == 0  # nothing sent since the last snapshot
+
+        text = stats.openmetrics(labels={"synth": "main"})
+        assert 'fluidsynth_events_total{synth="main"} 2' in text
+        assert 'fluidsynth_render_seconds_bucket{synth="main",le="+Inf"} 4' in text
+        assert text.endswith("# EOF\n")
+    finally:
+        synth.delete()
+
+
+def test_tracing_counts_c_calls(tmp_path) -> None:
+    fluidsynth.reset_tracing()
+    fluidsynth.enable_tracing(max_events=10)
+    try:
+        synth = fluidsynth.Synth()
+        try:
+            synth.noteon(0, 60, 100)
+            synth.get_samples(64)
+            synth.get_samples(64)
+            synth.send_events([[fluidsynth.NOTE_OFF, 0, 60, 0]])
+        finally:
+            synth.delete()
+    finally:
+        fluidsynth.disable_tracing()
+    stats = fluidsynth.tracing_stats()
+    assert stats["fluid_synth_noteon"].calls == 1
+    assert stats["fluid_synth_noteoff"].calls == 1  # bare prototypes are traced too
+    assert stats["fluid_synth_write_s16"].calls == 2
+    assert 0 <= stats["fluid_synth_write_s16"].conversion_seconds <= stats["fluid_synth_write_s16"].seconds
+    assert "fluid_synth_write_s16" in fluidsynth.tracing_table()
+
+    trace = tmp_path / "trace.json"
+    fluidsynth.write_chrome_trace(trace)
+    events = json.loads(trace.read_text())["traceEvents"]
+    assert len(events) == 10
+    assert events[0]["ph"] == "X"
+
+    # tracing is off again: nothing more is counted
+    synth = fluidsynth.Synth()
+    synth.noteon(0, 60, 100)
+    synth.delete()
+    assert fluidsynth.tracing_stats()["fluid_synth_noteon"].calls == 1
+    fluidsynth.reset_tracing()
+
+
+def test_synth_cpu_cores_option() -> None:
+    synth = fluidsynth.Synth(cpu_cores="auto")
+    try:
+        assert synth.get_setting("synth.cpu-cores") >= 1
+    finally:
+        synth.delete()
+    synth = fluidsynth.Synth(cpu_cores=2)
+    try:
+        assert synth.get_setting("synth.cpu-cores") == 2
+    finally:
+        synth.delete()
+    for bad in (0, 100000, "many", 1.5):
+        with pytest.raises(ValueError, match="cpu_cores"):
+            fluidsynth.Synth(cpu_cores=bad)
+
+
+def _smf(track: bytes, division: int = 96) -> bytes:
+    header = b"MThd" + (6).to_bytes(4, "big") + (0).to_bytes(2, "big") + (1).to_bytes(2, "big")
+    return header + division.to_bytes(2, "big") + b"MTrk" + len(track).to_bytes(4, "big") + track
+
+
+def test_load_midi_tempo_map_and_running_status() -> None:
+    track = bytes([
+        0x00, 0x90, 60, 100,                      # note on
+        0x60, 0xFF, 0x51, 3, 0x0F, 0x42, 0x40,    # tick 96: tempo 60 bpm
+        0x00, 60, 0,                              # running status note on, velocity 0
+        0x60, 0xE0, 0x00, 0x40,                   # tick 192: pitch bend center
+        0x60, 0xC1, 5,                            # tick 288: program change
+        0x00, 0xFF, 0x2F, 0,                      # end of track
+    ])
+    events = fluidsynth.load_midi(_smf(track))
+    assert events["tick"].tolist() == [0, 96, 192, 288]
+    assert events["time_s"].tolist() == [0.0, 0.5, 1.5, 2.5]
+    assert events["type"].tolist() == [fluidsynth.NOTE_ON, fluidsynth.NOTE_OFF,
+                                       fluidsynth.PITCH_BEND, fluidsynth.PROGRAM_CHANGE]
+    assert events["data1"].tolist() == [60, 60, 8192, 5]
+    assert events["chan"].tolist() == [0, 0, 0, 1]
+    with pytest.raises(ValueError, match="Truncated"):
+        fluidsynth.load_midi(_smf(track)[:-3])
+    with pytest.raises(ValueError, match="Not a Standard MIDI File"):
+        fluidsynth.load_midi(b"RIFF0000")
+
+
+def test_load_midi_feeds_render_events() -> None:
+    sf2 = _asset_path("example.sf2")
+    events = fluidsynth.load_midi(_asset_path("1080-c01.mid"))
+    assert len(events) > 0
+    assert np.all(np.diff(events["time_s"]) >= 0)
+    synth = fluidsynth.Synth()
+    try:
+        synth.sfload(str(sf2))
+        audio = synth.render_events(events, 44100 * 2)
+        assert audio.shape == (44100 * 4,)
+        assert np.any(audio != 0)
+    finally:
+        synth.delete()
+
+
+def test_render_midi_from_memory_and_playlists(tmp_path) -> None:
+    import io
+
+    sf2 = _asset_path("example.sf2")
+    mid = _asset_path("1080-c01.mid")
+    data = mid.read_bytes()
+    synth = fluidsynth.Synth()
+    try:
+        synth.sfload(str(sf2))
+        from_file = sum(len(b) for b in synth.render_midi(str(mid), chunk_frames=44100))
+        from_bytes = sum(len(b) for b in synth.render_midi(data, chunk_frames=44100))
+        from_view = sum(len(b) for b in synth.render_midi(memoryview(bytearray(data)), chunk_frames=44100))
+        assert from_file == from_bytes == from_view
+        playlist = sum(len(b) for b in synth.render_midi([data, io.BytesIO(data)], chunk_frames=44100))
+        assert playlist >= 2 * from_file - 4 * 44100
+        assert synth.midi2audio(data, str(tmp_path / "out.wav")) > 0
+        assert synth.midi2audio(b"not midi", str(tmp_path / "bad.wav")) == fluidsynth.FLUID_FAILED
+        with pytest.raises(OSError, match="bytes MIDI data"):
+            list(synth.render_midi(b"not midi"))
+    finally:
+        synth.delete()
+
+
+def test_player_position_and_tick_callback() -> None:
+    sf2 = _asset_path("example.sf2")
+    mid = _asset_path("1080-c01.mid")
+    synth = fluidsynth.Synth()
+    try:
+        synth.sfload(str(sf2))
+        ticks = []
+        assert synth.play_midi_file(str(mid)) == fluidsynth.FLUID_OK
+        synth.player_set_tick_callback(ticks.append)
+        synth.get_samples(44100)  # the player follows the rendered samples
+        assert synth.player_get_total_ticks() > synth.player_get_tick() > 0
+        assert synth.player_get_bpm() > 0
+        assert ticks
+        assert ticks == sorted(ticks)
+        synth.player_set_tick_callback(None)
+        synth.play_midi_stop()
+    finally:
+        synth.delete()
+
+
+def test_render_range_windows_line_up() -> None:
+    sf2 = _asset_path("example.sf2")
+    mid = _asset_path("1080-c01.mid")
+    events = fluidsynth.load_midi(mid)
+    # ticks of two consecutive windows in the middle of the song
+    a, b, c = (int(events["tick"][len(events) * i // 4]) for i in (1, 2, 3))
+    t = dict(zip(events["tick"].tolist(), events["time_s"].tolist(), strict=False))
+    synth = fluidsynth.Synth()
+    try:
+        synth.sfload(str(sf2))
+        first = synth.render_range(str(mid), a, b)
+        second = synth.render_range(mid.read_bytes(), b, c, dtype=np.float32)
+        assert first.dtype == np.int16
+        assert second.dtype == np.float32
+        assert len(first) // 2 == round(t[b] * 44100) - round(t[a] * 44100)
+        assert len(second) // 2 == round(t[c] * 44100) - round(t[b] * 44100)
+        assert np.any(first != 0)
+        assert np.any(second != 0)
+        with pytest.raises(ValueError, match="start_tick"):
+            synth.render_range(str(mid), b, a)
+    finally:
+        synth.delete()
+
+
+def test_render_cache_hits_and_key(tmp_path) -> None:
+    sf2 = _asset_path("example.sf2")
+    mid = _asset_path("1080-c01.mid")
+    cache = fluidsynth.RenderCache(tmp_path / "cache")
+    synth = fluidsynth.Synth()
+    try:
+        synth.sfload(str(sf2))
+        rendered = np.concatenate(list(synth.render_midi(str(mid), cache=cache)))
+        assert (cache.hits, cache.misses) == (0, 1)
+        cached = np.concatenate(list(synth.render_midi(mid.read_bytes(), cache=cache)))
+        assert cache.hits == 1
+        assert np.array_equal(rendered, cached)
+        frames = synth.midi2audio(str(mid), str(tmp_path / "a.wav"), cache=cache)
+        assert synth.midi2audio(str(mid), str(tmp_path / "b.wav"), cache=cache) == frames
+        assert (tmp_path / "a.wav").read_bytes() == (tmp_path / "b.wav").read_bytes()
+        # a different setting renders again
+        synth.setting("synth.gain", 0.5)
+        synth.render_range(str(mid), 0, 960, cache=cache)
+        assert cache.misses == 3
+        with pytest.raises(ValueError, match="cache"):
+            synth.render_events(np.zeros(0, fluidsynth.TIMED_EVENT_DTYPE), 64, out=np.zeros(128, np.int16),
+                                cache=cache)
+    finally:
+        synth.delete()
+
+
+def test_render_cache_evicts_least_recently_used(tmp_path) -> None:
+    cache = fluidsynth.RenderCache(tmp_path, max_bytes=3000)
+    cache.put("a", np.zeros(500, np.int16))
+    time.sleep(0.01)
+    cache.put("b", np.zeros(500, np.int16))
+    time.sleep(0.01)
+    assert cache.get("a") is not None  # now the most recently used
+    time.sleep(0.01)
+    cache.put("c", np.zeros(500, np.int16))
+    assert cache.get("b") is None
+    hit = cache.get("a")
+    assert isinstance(hit, np.memmap)
+    assert not hit.flags.writeable
+    cache.clear()
+    assert cache.get("c") is None
+
+
+def _render_digest(sf2: str, mid: str, chunks, dtype=np.int16) -> str:
+    synth = fluidsynth.Synth(deterministic=True)
+    try:
+        synth.sfload(sf2)
+        synth.play_midi_file(mid)
+        audio = np.concatenate([synth.get_samples(n, dtype=dtype) for n in chunks])
+        return hashlib.sha256(audio.tobytes()).hexdigest()
+    finally:
+        synth.delete()
+
+
+def test_deterministic_renders_are_bit_identical() -> None:
+    sf2 = str(_asset_path("example.sf2"))
+    mid = str(_asset_path("1080-c01.mid"))
+    chunkings = ([44100], [1000, 43100], [441] * 100, [64, 4000, 40036])
+    for dtype in (np.int16, np.float32):
+        assert len({_render_digest(sf2, mid, chunks, dtype) for chunks in chunkings}) == 1
+    # the same audio again in a fresh process
+    code = f"from tests.test_pyfluidsynth import _render_digest; print(_render_digest({sf2!r}, {mid!r}, [44100]))"
+    root = Path(__file__).resolve().parent.parent
+    result = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True)  # noqa: S603
+    assert result.stdout.strip() == _render_digest(sf2, mid, [44100])
+
+    synth = fluidsynth.Synth(deterministic=True)
+    try:
+        assert synth.get_setting("synth.cpu-cores") == 1
+        assert synth.get_setting("audio.period-size") == 64
+    finally:
+        synth.delete()
+    with pytest.raises(ValueError, match="single CPU core"):
+        fluidsynth.Synth(deterministic=True, cpu_cores=2)
+
+
+def _reference_digest_key() -> str:
+    return f"{'.'.join(map(str, fluidsynth._version))} {platform.machine()}"  # noqa: SLF001
+
+
+def _reference_render_digest() -> str:
+    return _render_digest(str(_asset_path("example.sf2")), str(_asset_path("1080-c01.mid")), [44100 * 2])
+
+
+def test_deterministic_render_matches_reference_digest() -> None:
+    """Catch output changes across releases, per libfluidsynth version and machine
+
+    Digests of new library versions are recorded with
+    python -m tests.record_render_digests
+    """
+    digests = json.loads(_asset_path("render_digests.json").read_text())
+    key = _reference_digest_key()
+    if key not in digests:
+        pytest.skip(f"No reference digest for {key}, record it with python -m tests.record_render_digests")
+    assert _reference_render_digest() == digests[key]